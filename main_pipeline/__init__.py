@@ -1,7 +1,34 @@
-from .state import *
-from .prompts import *
-from .tools import *
-from .agents import *
-from .rag import *
-from .graph import *
-from .demo import *
\ No newline at end of file
+import importlib
+
+# Public names are resolved from their submodule on first access (PEP 562), so importing a single
+# submodule such as main_pipeline.graph does not pull in every agent dependency.
+_SUBMODULES = ("state", "prompts", "tools", "agents", "rag", "graph", "demo")
+
+# Explicit owner of each lazily exported name; only that one submodule is imported on access.
+_EXPORTS = {
+    "state": ("TestCase", "TestResult", "ErrorKind", "GraphState", "make_graph_state",
+              "extend_or_reset", "APPEND_ONLY_FIELDS", "merge_state_update"),
+    "prompts": ("architect_prompt_template", "planner_prompt_template", "dev_code_gen_prompt_template",
+                "validation_prompt_template", "critique_prompt_template",
+                "test_case_designer_prompt_template", "qa_agent_prompt_template"),
+    "tools": ("code_tester_tool", "code_tester_batch", "extract_python_code"),
+    "agents": ("architect_agent_node", "planner_agent_node", "developer_agent_node", "qa_batch_runner_node",
+               "validation_agent_node", "post_dev_super_node", "apost_dev_super_node",
+               "test_case_designer_node", "critique_agent_node", "qa_cache_key", "clear_chain_cache"),
+    "rag": ("initialize_rag_engines", "cached_rag_query"),
+    "graph": ("build_graph", "decide_after_architect", "decide_after_planner", "decide_after_test_case_designer",
+              "decide_after_qa", "decide_after_validation", "decide_after_post_dev", "decide_after_packaging",
+              "artifact_packaging_node", "handoff_node"),
+    "demo": ("initial_state", "initial_user_req", "run_demo"),
+}
+_NAME_TO_SUBMODULE = {name: submodule_name for submodule_name, names in _EXPORTS.items() for name in names}
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    submodule_name = _NAME_TO_SUBMODULE.get(name)
+    if submodule_name is not None:
+        value = getattr(importlib.import_module(f".{submodule_name}", __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
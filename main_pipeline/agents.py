@@ -1,91 +1,180 @@
 import logging
-from .prompts import architect_prompt_template, planner_prompt_template, dev_code_gen_prompt_template, validation_prompt_template, critique_prompt_template, test_case_designer_prompt_template, qa_agent_prompt
-from .state import GraphState
-from .rag import architect_rag_query_engine_global, planner_rag_query_engine_global, developer_rag_query_engine_global, validation_rag_query_engine_global, critique_rag_query_engine_global
-from .tools import code_tester_tool, extract_python_code
+import asyncio
+import re
+import json
+import ast
+import functools
+import itertools
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import diskcache
+from .prompts import architect_prompt_template, planner_prompt_template, dev_code_gen_prompt_template, validation_prompt_template, critique_prompt_template, test_case_designer_prompt_template, qa_agent_prompt_template
+from .state import GraphState, ErrorKind
+from .rag import cached_rag_query
+from .tools import code_tester_batch, extract_python_code
 from langchain_openai import ChatOpenAI
-from langchain_core.output_parsers import StrOutputParser
-from langchain.agents import AgentExecutor, create_openai_tools_agent
-from typing import Any, List, Dict, Literal
+from langchain_core.exceptions import OutputParserException
+from langchain_core.output_parsers import StrOutputParser, PydanticOutputParser
+from langchain_core.runnables import Runnable, RunnableLambda
+from langchain_core.messages import AIMessage
+from typing import Any, List, Dict, Literal, Optional
+from pydantic import BaseModel, ValidationError
 import os
 
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # orjson is optional; fall back to the stdlib parser.
+    _loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+QA_CACHE_DIR = os.getenv("QA_CACHE_DIR", "./.qa_cache")
+# Only deterministic code_tester_batch outcomes are cached; runtime_error also covers timeouts and
+# sandbox crashes, and tool_error depends on the QA LLM run, so neither is replayed.
+CACHEABLE_TEST_STATUSES = ("success", "compilation_error", "test_fail")
+# Bump whenever code_tester_batch's verdicts or the cached payload change, so stale entries stop matching.
+QA_CACHE_VERSION = 2
+# Number of most recent feedback entries sent verbatim to the developer; older ones are summarized.
+FEEDBACK_HISTORY_WINDOW = 3
+# Used when the state predates the max_parallel_agents knob.
+DEFAULT_MAX_PARALLEL_AGENTS = 4
+
+def qa_cache_key(generated_code: str, test_case: Dict[str, Any]) -> str:
+    """Content-address a (code, test case) pair. The code is normalized through its AST so
+    comment/whitespace-only changes between refinement attempts map to the same key."""
+    try:
+        normalized_code = ast.dump(ast.parse(generated_code))
+    except SyntaxError:
+        normalized_code = generated_code
+    test_case_repr = repr((test_case["function_name"], test_case["inputs"], test_case["expected_output"]))
+    return hashlib.sha256(f"v{QA_CACHE_VERSION}:".encode() + normalized_code.encode() + test_case_repr.encode()).hexdigest()
+
+class TestCaseModel(BaseModel):
+    function_name: str
+    inputs: tuple
+    expected_output: Any
+    description: str
+
+class TestCaseResponse(BaseModel):
+    test_cases: List[TestCaseModel]
+
+class SimpleJsonOutputParser(StrOutputParser):
+    def parse(self, text:str) -> Any:
+        # Try to extract JSON from ```json ... ``` markdown block
+        match_md = re.search(r"```json\n(.*?)\n```", text, re.DOTALL)
+        if match_md:
+            json_text = match_md.group(1).strip()
+        else:
+            # If no markdown, assume the whole text is JSON or attempt to find JSON object within text
+            match_obj = re.search(r"\{.*\}", text, re.DOTALL)
+            if match_obj:
+                json_text = match_obj.group(0)
+            else: # No clear JSON object found
+                logger.error(f"JSON Parser: No JSON block or object found in text: {text[:200]}...")
+                return {"error": "JSON parsing failed: No JSON found", "raw_text": text}
+        try:
+            return _loads(json_text)
+        except json.JSONDecodeError as e:  # orjson.JSONDecodeError subclasses this
+            logger.error(f"JSON Parser Error: {e} in JSON text: {json_text[:200]}...")
+            return {"error": f"JSON parsing failed: {e}", "raw_json_text": json_text, "original_text": text}
+
+def get_llm_instance(model_name: str, temperature: float = 0.2, mock_response: str = "") -> Runnable:
+    logger.debug("Initializing LLM with model '%s' (temperature=%s).", model_name, temperature)
+    try: return ChatOpenAI(model=model_name, temperature=temperature)
+    except Exception as e:
+        logger.error(f"LLM init error for {model_name}: {e}. Using mock.", exc_info=True)
+        def mock_llm(_prompt_value):
+            logger.warning(f"MockLLM invoked for {model_name}"); return mock_response
+        return RunnableLambda(mock_llm)
+
+# template name -> (prompt template, output parser class) for the prompt | llm | parser chains
+CHAIN_SPECS = {
+    "architect": (architect_prompt_template, SimpleJsonOutputParser),
+    "planner": (planner_prompt_template, SimpleJsonOutputParser),
+    "developer": (dev_code_gen_prompt_template, StrOutputParser),
+    "validation": (validation_prompt_template, SimpleJsonOutputParser),
+    "test_case_designer": (test_case_designer_prompt_template, functools.partial(PydanticOutputParser, pydantic_object=TestCaseResponse)),
+    "critique": (critique_prompt_template, StrOutputParser),
+    "qa": (qa_agent_prompt_template, StrOutputParser),
+}
+
+# Environment that decides which client (or mock) get_llm_instance builds; part of the chain cache key.
+LLM_CONFIG_ENV_VARS = ("OPENAI_API_KEY", "OPENAI_BASE_URL", "OPENAI_ORG_ID")
+
+def _llm_config_key() -> str:
+    # Hashed so credentials never sit in the cache key itself.
+    return hashlib.sha256("\0".join(os.getenv(name, "") for name in LLM_CONFIG_ENV_VARS).encode()).hexdigest()
+
+@functools.lru_cache(maxsize=32)
+def _build_chain(template_name: str, model_name: str, temperature: float, mock_response: str, llm_config_key: str) -> Runnable:
+    prompt_template, output_parser_cls = CHAIN_SPECS[template_name]
+    return prompt_template | get_llm_instance(model_name, temperature, mock_response) | output_parser_cls()
+
+def _get_chain(template_name: str, model_name: str, temperature: float, mock_response: str = "") -> Runnable:
+    """Build the prompt | llm | parser chain once per (template, model, temperature, LLM config) and reuse it
+    across node runs; a changed model or API key builds a fresh chain instead of reusing a stale client or mock."""
+    return _build_chain(template_name, model_name, temperature, mock_response, _llm_config_key())
+
+def clear_chain_cache() -> None:
+    """Drop every cached chain, e.g. when the UI resets its state."""
+    _build_chain.cache_clear()
+
 # All agent node functions
 
 def architect_agent_node(state: GraphState) -> GraphState:
-    logger = logging.getLogger(__name__)
     logger.info("Entering Architect Node")
+    cfg = state["llm_models_config"]
+    architect_model = cfg.get("architect_llm", "gpt-3.5-turbo-0125")
     user_request = state["initial_user_request"]
     architectural_principles_context = "No architectural principles RAG context available."
-    if architect_rag_query_engine_global:
-        try:
-            response = architect_rag_query_engine_global.query("General architectural principles for this project type and user request.")
-            architectural_principles_context = str(response)
-            logger.debug(f"Architect RAG context: {architectural_principles_context[:100]}...")
-        except Exception as e:
-            logger.warning(f"RAG error (architect): {e}"); architectural_principles_context = f"RAG error (architect): {e}"
-    def get_llm_instance(model_name_key: str, state: GraphState, default_model="gpt-3.5-turbo-0125", temperature=0.2, mock_response="") -> ChatOpenAI:
-        model_name = state["llm_models_config"].get(model_name_key, default_model)
-        logger.debug(f"Initializing LLM for '{model_name_key}' with model '{model_name}'.")
-        try: return ChatOpenAI(model=model_name, temperature=temperature)
-        except Exception as e:
-            logger.error(f"LLM init error for {model_name_key} ({model_name}): {e}. Using mock.", exc_info=True)
-            class MockLLM:
-                def invoke(self, *args, **kwargs):
-                    logger.warning(f"MockLLM invoked for {model_name_key}"); return mock_response
-            return MockLLM() # type: ignore
-    llm_architect = get_llm_instance("architect_llm", state, temperature=0.2, mock_response='{"chosen_language": "python", "framework_hint": "standard_library", "high_level_notes": "Focus on a clear, single Python function for this MVP."}')
-    architect_chain_instance = architect_prompt_template | llm_architect | SimpleJsonOutputParser()
+    try:
+        response = cached_rag_query("architect", "General architectural principles for this project type and user request.")
+        if response is not None:
+            architectural_principles_context = response
+            logger.debug("Architect RAG context: %s...", architectural_principles_context[:100])
+    except Exception as e:
+        logger.warning(f"RAG error (architect): {e}"); architectural_principles_context = f"RAG error (architect): {e}"
+    architect_chain_instance = _get_chain("architect", architect_model, 0.2, mock_response='{"chosen_language": "python", "framework_hint": "standard_library", "high_level_notes": "Focus on a clear, single Python function for this MVP."}')
     arch_decision_json = architect_chain_instance.invoke({
         "user_request": user_request,
         "architectural_principles_context": architectural_principles_context
     })
-    logger.error(type(arch_decision_json))
-    logger.debug(f"Architect LLM Raw Output (parsed): {arch_decision_json}")
+    logger.debug("Architect LLM Raw Output (parsed, %s): %s", type(arch_decision_json).__name__, arch_decision_json)
     if isinstance(arch_decision_json, dict) and "chosen_language" in arch_decision_json and not arch_decision_json.get("error"):
         logger.info(f"Architect Decision: Language='{arch_decision_json.get('chosen_language')}', Framework='{arch_decision_json.get('framework_hint')}', Notes='{arch_decision_json.get('high_level_notes', '')[:50]}...'. Exiting Architect Node.")
         return {
-            **state, "architectural_decision": arch_decision_json, "current_error": None,
+            "architectural_decision": arch_decision_json, "current_error": None,
             "planned_task_description": None, "planner_notes": None, "task_description": "",
             "clarified_user_input": None, "clarification_questions_for_user": None,
             "planner_iteration_count": 0, "generated_code": None, "current_test_status": None, "critique": None,
             "validation_status": None, "packaged_artifacts_info": None, "handoff_summary": None,
-            "feedback_history": [], "refinement_count": 0
+            "feedback_history": None, "test_results_summary": None, "qa_agent_messages": None, "refinement_count": 0
         }
     else:
         error_msg = f"Architect Error: Invalid output format or missing key fields from LLM. Output: {arch_decision_json}"
         logger.error(error_msg)
-        return {**state, "architectural_decision": None, "current_error": error_msg}
+        return {"architectural_decision": None, "current_error": (ErrorKind.ARCHITECT, error_msg)}
 
 def planner_agent_node(state):
-    logger = logging.getLogger(__name__)
     logger.info(f"Entering Planner Node (Iteration {state['planner_iteration_count'] + 1})")
+    cfg = state["llm_models_config"]
+    planner_model = cfg.get("planner_llm", "gpt-3.5-turbo-0125")
     arch_decision = state["architectural_decision"]
     if not arch_decision or not isinstance(arch_decision, dict) or "chosen_language" not in arch_decision:
         error_msg = "Planner Error: Missing or invalid architectural decision from Architect."
         logger.error(error_msg)
-        return {**state, "current_error": error_msg, "clarification_questions_for_user": None}
+        return {"current_error": (ErrorKind.PLANNER, error_msg), "clarification_questions_for_user": None}
     current_request_to_process = state.get("clarified_user_input") or state["initial_user_request"]
-    logger.debug(f"Planner processing request: {current_request_to_process[:100]}... with Arch: {arch_decision}")
+    logger.debug("Planner processing request: %s... with Arch: %s", current_request_to_process[:100], arch_decision)
     planning_context = "No planning guidelines RAG context available."
-    if planner_rag_query_engine_global:
-        try:
-            response = planner_rag_query_engine_global.query(f"Planning guidelines for a '{arch_decision.get('chosen_language')}' task using '{arch_decision.get('framework_hint')}'.")
-            planning_context = str(response)
-        except Exception as e:
-            logger.warning(f"RAG error (planner): {e}"); planning_context = f"RAG error (planner): {e}"
-    def get_llm_instance(model_name_key: str, state, default_model="gpt-3.5-turbo-0125", temperature=0.3, mock_response=""):
-        from langchain_openai import ChatOpenAI
-        model_name = state["llm_models_config"].get(model_name_key, default_model)
-        logger.debug(f"Initializing LLM for '{model_name_key}' with model '{model_name}'.")
-        try: return ChatOpenAI(model=model_name, temperature=temperature)
-        except Exception as e:
-            logger.error(f"LLM init error for {model_name_key} ({model_name}): {e}. Using mock.", exc_info=True)
-            class MockLLM:
-                def invoke(self, *args, **kwargs):
-                    logger.warning(f"MockLLM invoked for {model_name_key}"); return mock_response
-            return MockLLM() # type: ignore
-    llm_planner = get_llm_instance("planner_llm", state, temperature=0.3, mock_response='{"clarification_questions": [], "planned_task_description": "Mock plan for greet function", "planner_notes": "Mock notes: Ensure docstring for greet function."}')
-    planner_chain_instance = planner_prompt_template | llm_planner | SimpleJsonOutputParser()
+    try:
+        response = cached_rag_query("planner", f"Planning guidelines for a '{arch_decision.get('chosen_language')}' task using '{arch_decision.get('framework_hint')}'.")
+        if response is not None:
+            planning_context = response
+    except Exception as e:
+        logger.warning(f"RAG error (planner): {e}"); planning_context = f"RAG error (planner): {e}"
+    planner_chain_instance = _get_chain("planner", planner_model, 0.3, mock_response='{"clarification_questions": [], "planned_task_description": "Mock plan for greet function", "planner_notes": "Mock notes: Ensure docstring for greet function."}')
     planned_output_json = planner_chain_instance.invoke({
         "user_request_to_process": current_request_to_process,
         "planning_guidelines_context": planning_context,
@@ -93,7 +182,7 @@ def planner_agent_node(state):
         "framework_hint": arch_decision.get("framework_hint", "standard_library"),
         "architect_notes": arch_decision.get("high_level_notes", "None")
     })
-    logger.debug(f"Planner LLM Raw Output (parsed): {planned_output_json}")
+    logger.debug("Planner LLM Raw Output (parsed): %s", planned_output_json)
     new_planner_iteration_count = state["planner_iteration_count"] + 1
     questions_for_user = []
     planned_task_desc = None
@@ -114,20 +203,23 @@ def planner_agent_node(state):
         current_error_for_state = f"Planner Error: Invalid output format from LLM or parsing error. Output: {planned_output_json}"
     logger.info(f"Exiting Planner Node. Questions asked: {bool(questions_for_user)}. Plan generated: {bool(planned_task_desc)}")
     return {
-        **state, "planned_task_description": planned_task_desc,
+        "planned_task_description": planned_task_desc,
         "task_description": planned_task_desc if planned_task_desc else state.get("task_description",""),
         "planner_notes": planner_notes_str,
         "clarification_questions_for_user": questions_for_user if questions_for_user else None,
-        "clarified_user_input": None, "planner_iteration_count": new_planner_iteration_count, "current_error": current_error_for_state,
+        "clarified_user_input": None, "planner_iteration_count": new_planner_iteration_count,
+        "current_error": (ErrorKind.PLANNER, current_error_for_state) if current_error_for_state else None,
         "critique": None, "validation_status": None, "validation_issues": [], "packaged_artifacts_info": None, "handoff_summary": None,
         "generated_code": None, "current_test_status": None, "current_test_message": None,
-        "feedback_history": [] if new_planner_iteration_count == 1 else state.get("feedback_history",[]),
+        # None clears the reducer field on the first planning pass; [] leaves it untouched
+        "feedback_history": None if new_planner_iteration_count == 1 else [],
         "refinement_count": 0 if new_planner_iteration_count == 1 else state.get("refinement_count",0)
     }
 
 def developer_agent_node(state):
-    logger = logging.getLogger(__name__)
     logger.info("Entering Developer Node")
+    cfg = state["llm_models_config"]
+    developer_model = cfg.get("developer_llm", "gpt-3.5-turbo")
     dev_task_description = state["task_description"]
     dev_notes = state["planner_notes"]
     latest_critique = state.get("critique", "No specific critique. Focus on initial implementation or previous test/validation feedback if any.")
@@ -135,133 +227,139 @@ def developer_agent_node(state):
     refinement_count = state["refinement_count"]
     if not dev_task_description or "Error:" in dev_task_description:
         logger.error(f"Developer received invalid task from planner: {dev_task_description}")
-        return {**state, "generated_code": None, "current_test_status": "tool_error", "current_error": dev_task_description, "refinement_count": refinement_count + 1}
-    logger.debug(f"Developer task: {str(dev_task_description)[:100]}..., Critique: {str(latest_critique)[:100]}...")
+        return {"generated_code": None, "current_test_status": "tool_error", "current_error": (ErrorKind.PLANNER, dev_task_description), "refinement_count": refinement_count + 1}
+    logger.debug("Developer task: %s..., Critique: %s...", str(dev_task_description)[:100], str(latest_critique)[:100])
     coding_standards_context = "No coding standards RAG context available."
-    if developer_rag_query_engine_global:
-        try:
-            response = developer_rag_query_engine_global.query(f"Coding standards for: {dev_task_description}")
-            coding_standards_context = str(response)
-        except Exception as e:
-            logger.warning(f"RAG error (developer): {e}"); coding_standards_context = f"RAG error (developer): {e}"
-    def get_llm_instance(model_name_key: str, state, mock_response=""):
-        from langchain_openai import ChatOpenAI
-        model_name = state["llm_models_config"].get(model_name_key, "gpt-3.5-turbo")
-        try: return ChatOpenAI(model=model_name, temperature=0.2)
-        except Exception as e:
-            logger.error(f"LLM init error for {model_name_key} ({model_name}): {e}. Using mock.", exc_info=True)
-            class MockLLM:
-                def invoke(self, *args, **kwargs):
-                    logger.warning(f"MockLLM invoked for {model_name_key}"); return mock_response
-            return MockLLM() # type: ignore
-    llm_developer = get_llm_instance("developer_llm", state, mock_response="```python\n# Mocked Code by Developer\ndef example():\n  pass\n```")
-    developer_chain_instance = dev_code_gen_prompt_template | llm_developer | SimpleJsonOutputParser()
+    try:
+        response = cached_rag_query("developer", f"Coding standards for: {dev_task_description}")
+        if response is not None:
+            coding_standards_context = response
+    except Exception as e:
+        logger.warning(f"RAG error (developer): {e}"); coding_standards_context = f"RAG error (developer): {e}"
+    trimmed_feedback_history = full_feedback_history_list[-FEEDBACK_HISTORY_WINDOW:]
+    if len(full_feedback_history_list) > FEEDBACK_HISTORY_WINDOW:
+        trimmed_feedback_history = [f"[{len(full_feedback_history_list) - FEEDBACK_HISTORY_WINDOW} earlier feedback entries omitted]"] + trimmed_feedback_history
+    developer_chain_instance = _get_chain("developer", developer_model, 0.2, mock_response="```python\n# Mocked Code by Developer\ndef example():\n  pass\n```")
     llm_response = developer_chain_instance.invoke({
         "developer_task_description": dev_task_description,
         "developer_notes": dev_notes or "None",
         "coding_standards_context": coding_standards_context,
         "critique_message": latest_critique,
-        "full_feedback_history": "\n".join(full_feedback_history_list) if full_feedback_history_list else "This is the first attempt for this version of the plan."
+        "full_feedback_history": "\n".join(trimmed_feedback_history) if trimmed_feedback_history else "This is the first attempt for this version of the plan."
     })
     generated_code_str = extract_python_code(llm_response)
     current_attempt_count = refinement_count + 1
     if not generated_code_str:
         error_message = "Developer agent failed to produce a parsable code block."
         logger.error(error_message + f" LLM Raw: {llm_response[:100]}...")
-        updated_feedback_history = list(state.get("feedback_history", []))
-        updated_feedback_history.append(f"DevAttempt {current_attempt_count}: Failed to generate parsable code. LLM raw output snippet: '{llm_response[:100]}...'")
-        return {**state, "generated_code": None, "current_test_status": "tool_error", "current_test_message": error_message,
-                "current_error": error_message, "refinement_count": current_attempt_count, "feedback_history": updated_feedback_history}
+        new_feedback = f"DevAttempt {current_attempt_count}: Failed to generate parsable code. LLM raw output snippet: '{llm_response[:100]}...'"
+        return {"generated_code": None, "current_test_status": "tool_error", "current_test_message": error_message,
+                "current_error": (ErrorKind.DEVELOPER, error_message), "refinement_count": current_attempt_count, "feedback_history": [new_feedback]}
     logger.info(f"Developer generated code (Attempt {current_attempt_count}). Exiting Developer Node.")
-    return {**state, "generated_code": generated_code_str, "refinement_count": current_attempt_count, "current_error": None,
+    return {"generated_code": generated_code_str, "refinement_count": current_attempt_count, "current_error": None,
             "critique": None, "validation_status": None, "validation_issues": [], "packaged_artifacts_info": None, "handoff_summary": None}
 
-def qa_agent_node(state):
-    logger = logging.getLogger(__name__)
-    logger.info("Entering QA Node (Explicit Tool Protocol Logging)")
+def _run_test_cases(qa_cache: diskcache.Cache, generated_code: str, test_cases: List[Dict[str, Any]], max_workers: int) -> List[Dict[str, Any]]:
+    """Run code_tester_batch for the test cases missing from the QA cache and return one TestResult per case.
+    Misses are split into at most max_workers batches, each executing the code once in its own sandbox."""
+    results: List[Optional[Dict[str, Any]]] = [None] * len(test_cases)
+    cache_keys = [qa_cache_key(generated_code, test_case) for test_case in test_cases]
+    misses = []
+    for index, (test_case, cache_key) in enumerate(zip(test_cases, cache_keys)):
+        cached_result = qa_cache.get(cache_key)
+        if cached_result is not None:
+            logger.info(f"QA cache hit for '{test_case.get('description')}': Status: {cached_result['status']}, Message: {cached_result['message']}.")
+            results[index] = {"test_case": test_case, **cached_result}
+        else:
+            misses.append(index)
+
+    def run_batch(indices):
+        calls = [(test_cases[i]["function_name"], tuple(test_cases[i]["inputs"]), test_cases[i]["expected_output"]) for i in indices]
+        return zip(indices, code_tester_batch(generated_code, calls))
+
+    if not misses:
+        return results
+    batch_count = max(1, min(max_workers, len(misses)))
+    batches = [misses[offset::batch_count] for offset in range(batch_count)]
+    with ThreadPoolExecutor(max_workers=batch_count) as executor:
+        for index, observation in itertools.chain.from_iterable(executor.map(run_batch, batches)):
+            test_case = test_cases[index]
+            result = {"status": observation.get("status", "tool_error"), "message": observation.get("message", "Tool output format error."),
+                      "actual_output": observation.get("actual_output")}
+            if result["status"] in CACHEABLE_TEST_STATUSES:
+                try:
+                    qa_cache.set(cache_keys[index], result)
+                except Exception as e:  # e.g. an actual_output that cannot be pickled; just skip caching it
+                    logger.debug("QA cache skipped for '%s': %s", test_case.get('description'), e)
+            results[index] = {"test_case": test_case, **result}
+    return results
+
+def qa_batch_runner_node(state):
+    logger.info("Entering QA Batch Runner Node")
+    cfg = state["llm_models_config"]
+    qa_model = cfg.get("qa_llm", "gpt-4o")
     generated_code = state["generated_code"]
-    task_desc_for_qa = state["task_description"]
-    test_case = state["generated_test_cases"][state["current_test_case_index"]]
+    test_cases = state["generated_test_cases"] or []
     if not generated_code:
         logger.error("QA: No code provided by developer.")
-        return {**state, "current_test_status": "tool_error", "current_test_message": "No code from dev for QA."}
-    logger.debug(f"QA Agent evaluating code for function '{test_case['function_name']}' (Dev Attempt {state['refinement_count']})")
-    test_status_from_agent = "tool_error"
-    test_message_from_agent = "QA agent did not successfully complete testing or parse results."
-    try:
-        agent_input = {
-            "task_description_for_qa": task_desc_for_qa, "function_name": test_case['function_name'],
-            "test_inputs": test_case['inputs'], "expected_output": test_case['expected_output'],
-            "generated_code": generated_code, "chat_history": state.get("qa_agent_messages", [])
-        }
-        def get_llm_instance(model_name_key: str, state, temperature=0.1):
-            from langchain_openai import ChatOpenAI
-            model_name = state["llm_models_config"].get(model_name_key, "gpt-4o")
-            return ChatOpenAI(model=model_name, temperature=temperature)
-        llm_qa = get_llm_instance("qa_llm", state, temperature=0.1)
-        qa_tools = [code_tester_tool]
-        qa_agent_for_node = create_openai_tools_agent(llm_qa, qa_tools, qa_agent_prompt)
-        qa_agent_executor_for_node = AgentExecutor(agent=qa_agent_for_node, tools=qa_tools, verbose=False, handle_parsing_errors="Always죄송합니다. 에이전트가 오류를 반환했습니다.", return_intermediate_steps=True)
-        qa_response = qa_agent_executor_for_node.invoke(agent_input)
-        logger.debug(f"QA Agent Raw Response from AgentExecutor: {qa_response}")
-        if "intermediate_steps" in qa_response and qa_response["intermediate_steps"]:
-            for action, observation in qa_response["intermediate_steps"]:
-                tool_name = action.tool if hasattr(action, 'tool') else "UnknownTool"
-                tool_input_args = action.tool_input if hasattr(action, 'tool_input') else {}
-                logger.info(f"[MCP Shim] Received Request: Tool='{tool_name}', Args={tool_input_args}")
-                logger.info(f"[MCP Shim] Executed Tool='{tool_name}', Result={observation}")
-                if isinstance(observation, dict) and tool_name == "code_tester_tool":
-                    test_status_from_agent = observation.get("status", "tool_error")
-                    test_message_from_agent = observation.get("message", "Tool output format error from MCP Shim.")
-        elif "output" in qa_response:
-            logger.warning(f"QA Agent did not use a tool as expected. Final output: {qa_response.get('output')}")
-            test_message_from_agent = str(qa_response.get("output", test_message_from_agent))
-        else:
-            logger.error("QA Agent response missing 'intermediate_steps' and 'output'. Cannot determine test result.")
-            if isinstance(qa_response.get("output"), str) and "죄송합니다. 에이전트가 오류를 반환했습니다." in qa_response.get("output"):
-                test_message_from_agent = "QA Agent encountered an internal parsing or execution error."
-    except Exception as e:
-        logger.error(f"QA agent execution error: {e}", exc_info=True)
-        test_status_from_agent = "tool_error"; test_message_from_agent = f"QA agent encountered an error: {e}"
-    logger.info(f"QA Final Test Status: {test_status_from_agent}, Message: {test_message_from_agent}. Exiting QA Node.")
-    return {**state, "current_test_status": test_status_from_agent, "current_test_message": test_message_from_agent,
-            "current_error": None, "qa_agent_messages": [], "validation_status": None, "validation_issues": [],
+        return {"current_test_status": "tool_error", "current_test_message": "No code from dev for QA.", "all_tests_passed": False}
+    logger.debug("QA running %s test cases directly (Dev Attempt %s)", len(test_cases), state['refinement_count'])
+    # code_tester_batch is deterministic, so cases run without an LLM round-trip, bounded by max_parallel_agents.
+    with diskcache.Cache(QA_CACHE_DIR) as qa_cache:
+        attempt_results = _run_test_cases(qa_cache, generated_code, test_cases, state.get("max_parallel_agents", DEFAULT_MAX_PARALLEL_AGENTS))
+    failed_results = [result for result in attempt_results if result["status"] != "success"]
+    qa_new_messages = []
+    all_passed = bool(attempt_results) and not failed_results
+    if all_passed:
+        test_status, test_message = "success", f"All {len(attempt_results)} test cases passed."
+    elif failed_results:
+        test_status = failed_results[0]["status"]
+        failure_summary = "\n".join(f"- {result['test_case'].get('description', result['test_case']['function_name'])}: "
+                                    f"[{result['status']}] {result['message']}" for result in failed_results)
+        test_message = failure_summary
+        # The QA LLM is only consulted once, to interpret the batch of failures for the critique agent.
+        try:
+            interpretation = _get_chain("qa", qa_model, 0.1).invoke({
+                "task_description_for_qa": state["task_description"], "generated_code": generated_code,
+                "passed_count": len(attempt_results) - len(failed_results), "total_count": len(attempt_results),
+                "failure_summary": failure_summary})
+            if isinstance(interpretation, str) and interpretation.strip():
+                test_message = f"{failure_summary}\nQA analysis: {interpretation.strip()}"
+                qa_new_messages.append(AIMessage(content=interpretation.strip()))
+        except Exception as e:
+            logger.error(f"QA interpretation LLM error: {e}", exc_info=True)
+    else:
+        test_status, test_message = "tool_error", "No test cases available for QA."
+    logger.info(f"QA Final Test Status: {test_status} ({len(attempt_results) - len(failed_results)}/{len(attempt_results)} passed), Message: {test_message}. Exiting QA Batch Runner Node.")
+    return {"test_results_summary": attempt_results, "current_test_status": test_status, "current_test_message": test_message,
+            "all_tests_passed": all_passed, "current_test_case_index": len(attempt_results),
+            "current_error": None, "qa_agent_messages": qa_new_messages, "validation_status": None, "validation_issues": [],
             "packaged_artifacts_info": None, "handoff_summary": None }
 
 def validation_agent_node(state):
-    logger = logging.getLogger(__name__)
     logger.info("Entering Validation Node")
+    cfg = state["llm_models_config"]
+    validation_model = cfg.get("validation_llm", "gpt-3.5-turbo")
     code_to_validate = state["generated_code"]
     task_desc = state["task_description"]
     planner_notes_str = state["planner_notes"]
     if not code_to_validate:
         logger.error("Validation: No code provided.")
-        return {**state, "validation_status": "error", "validation_issues": ["No code provided for validation."], "current_error": "Validation: No code."}
-    logger.debug(f"Validation agent reviewing code for task: {task_desc[:100]}...")
+        return {"validation_status": "error", "validation_issues": ["No code provided for validation."], "current_error": (ErrorKind.VALIDATION, "Validation: No code.")}
+    logger.debug("Validation agent reviewing code for task: %s...", task_desc[:100])
     validation_rules_context = "No validation rules RAG context available."
-    if validation_rag_query_engine_global:
-        try:
-            response = validation_rag_query_engine_global.query(f"Validation rules for Python code related to task: {task_desc}")
-            validation_rules_context = str(response)
-        except Exception as e:
-            logger.warning(f"RAG error (validation): {e}"); validation_rules_context = f"RAG error (validation): {e}"
-    def get_llm_instance(model_name_key: str, state, temperature=0.1, mock_response='{"validation_passed": true, "issues_found": []}'):
-        from langchain_openai import ChatOpenAI
-        model_name = state["llm_models_config"].get(model_name_key, "gpt-3.5-turbo")
-        try: return ChatOpenAI(model=model_name, temperature=temperature)
-        except Exception as e:
-            logger.error(f"LLM init error for {model_name_key} ({model_name}): {e}. Using mock.", exc_info=True)
-            class MockLLM:
-                def invoke(self, *args, **kwargs):
-                    logger.warning(f"MockLLM invoked for {model_name_key}"); return mock_response
-            return MockLLM() # type: ignore
-    llm_validation = get_llm_instance("validation_llm", state, temperature=0.1)
-    validation_chain_instance = validation_prompt_template | llm_validation | SimpleJsonOutputParser()
+    try:
+        response = cached_rag_query("validation", f"Validation rules for Python code related to task: {task_desc}")
+        if response is not None:
+            validation_rules_context = response
+    except Exception as e:
+        logger.warning(f"RAG error (validation): {e}"); validation_rules_context = f"RAG error (validation): {e}"
+    validation_chain_instance = _get_chain("validation", validation_model, 0.1, mock_response='{"validation_passed": true, "issues_found": []}')
     validation_output_json = validation_chain_instance.invoke({
         "task_description": task_desc, "planner_notes": planner_notes_str or "None",
         "code_to_validate": code_to_validate, "validation_rules_context": validation_rules_context
     })
-    logger.debug(f"Validation LLM Raw Output (parsed): {validation_output_json}")
+    logger.debug("Validation LLM Raw Output (parsed): %s", validation_output_json)
     issues_found = []
     val_passed = False
     val_status: Literal['pass', 'fail', 'error']
@@ -280,142 +378,116 @@ def validation_agent_node(state):
         issues_found = [f"Validation agent did not return expected JSON format or encountered parsing error. Output: {validation_output_json}"]
         val_status = "error"
     logger.info(f"Validation Status: {val_status}, Issues: {issues_found}. Exiting Validation Node.")
-    return {**state, "validation_status": val_status, "validation_issues": issues_found if issues_found else [], "current_error": None}
+    return {"validation_status": val_status, "validation_issues": issues_found if issues_found else [], "current_error": None}
+
+def _merge_post_dev_updates(qa_update: Dict[str, Any], validation_update: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    # QA resets the validation fields for a new attempt; the concurrent validation result supersedes that.
+    return {**qa_update, **validation_update} if validation_update else qa_update
+
+def post_dev_super_node(state):
+    """Run QA and validation on the freshly generated code concurrently; both only need the code and task."""
+    logger.info("Entering Post-Developer Node (QA + Validation)")
+    if not state["generated_code"]:
+        # Let QA report the missing code without validation overwriting the developer's error.
+        return qa_batch_runner_node(state)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        qa_future = executor.submit(qa_batch_runner_node, state)
+        validation_future = executor.submit(validation_agent_node, state)
+        return _merge_post_dev_updates(qa_future.result(), validation_future.result())
+
+async def apost_dev_super_node(state):
+    logger.info("Entering Post-Developer Node (QA + Validation, async)")
+    if not state["generated_code"]:
+        return await asyncio.to_thread(qa_batch_runner_node, state)
+    qa_update, validation_update = await asyncio.gather(
+        asyncio.to_thread(qa_batch_runner_node, state), asyncio.to_thread(validation_agent_node, state))
+    return _merge_post_dev_updates(qa_update, validation_update)
 
 def test_case_designer_node(state):
-    logger = logging.getLogger(__name__)
     logger.info("Entering Test Case Designer Node")
+    cfg = state["llm_models_config"]
+    test_designer_model = cfg.get("developer_llm", "gpt-3.5-turbo")
     if not state["planned_task_description"]:
         logger.error("Test Case Designer: No planned task description available.")
-        return {**state, "current_error": "Cannot design test cases without a task description.", "generated_test_cases": []}
+        return {"current_error": (ErrorKind.TEST_CASE_DESIGNER, "Cannot design test cases without a task description."), "generated_test_cases": []}
     task_desc = state["planned_task_description"]
     planner_notes = state.get("planner_notes", "")
-    def get_llm_instance(model_name_key: str, state, temperature=0.4, mock_response='{"test_cases": [{"function_name": "mock_func", "inputs": [1], "expected_output": 2, "description": "Mock test"}]}'):
-        from langchain_openai import ChatOpenAI
-        model_name = state["llm_models_config"].get(model_name_key, "gpt-3.5-turbo")
-        try: return ChatOpenAI(model=model_name, temperature=temperature)
-        except Exception as e:
-            logger.error(f"LLM init error for {model_name_key} ({model_name}): {e}. Using mock.", exc_info=True)
-            class MockLLM:
-                def invoke(self, *args, **kwargs):
-                    logger.warning(f"MockLLM invoked for {model_name_key}"); return mock_response
-            return MockLLM() # type: ignore
-    llm_test_designer = get_llm_instance("developer_llm", state, temperature=0.4)
-    from langchain_core.output_parsers import StrOutputParser
-    test_designer_chain = test_case_designer_prompt_template | llm_test_designer | SimpleJsonOutputParser()
+    test_designer_chain = _get_chain("test_case_designer", test_designer_model, 0.4, mock_response='{"test_cases": [{"function_name": "mock_func", "inputs": [1], "expected_output": 2, "description": "Mock test"}]}')
     try:
-        response_json = test_designer_chain.invoke({
+        response = test_designer_chain.invoke({
             "function_description": task_desc,
             "planner_notes": planner_notes
         })
-        logger.debug(f"Test Case Designer LLM Raw Output (parsed): {response_json}")
-        import json
-        if isinstance(response_json, str):
-            try:
-                response_json = json.loads(response_json)
-            except Exception:
-                pass
-        if isinstance(response_json, dict) and "test_cases" in response_json and isinstance(response_json["test_cases"], list):
-            generated_test_cases = []
-            valid_cases = True
-            for tc_data in response_json["test_cases"]:
-                if not (isinstance(tc_data, dict) and
-                        "function_name" in tc_data and isinstance(tc_data["function_name"], str) and
-                        "inputs" in tc_data and isinstance(tc_data["inputs"], (list, tuple)) and
-                        "expected_output" in tc_data and
-                        "description" in tc_data and isinstance(tc_data["description"], str)
-                        ):
-                    logger.warning(f"Invalid test case format from LLM: {tc_data}")
-                    valid_cases = False; break
-                tc_data["inputs"] = tuple(tc_data["inputs"])
-                generated_test_cases.append(tc_data)
-            if generated_test_cases and valid_cases:
-                logger.info(f"Successfully generated {len(generated_test_cases)} test cases.")
-                return {
-                    **state,
-                    "generated_test_cases": generated_test_cases,
-                    "current_test_case_index": 0,
-                    "all_tests_passed": False,
-                    "test_results_summary": [],
-                    "current_error": None
-                }
-            else:
-                error_msg = "Test Case Designer LLM did not return valid test cases or list was empty."
-                logger.error(error_msg)
-                return {**state, "current_error": error_msg, "generated_test_cases": []}
+        logger.debug("Test Case Designer LLM Raw Output (parsed): %s", response)
+        parsed = TestCaseResponse.model_validate(response)
+        generated_test_cases = [tc.model_dump() for tc in parsed.test_cases]
+        if generated_test_cases:
+            logger.info(f"Successfully generated {len(generated_test_cases)} test cases.")
+            return {
+                "generated_test_cases": generated_test_cases,
+                "current_test_case_index": 0,
+                "all_tests_passed": False,
+                "test_results_summary": None,
+                "current_error": None
+            }
         else:
-            error_msg = f"Test Case Designer LLM output error or malformed JSON: {response_json}"
+            error_msg = "Test Case Designer LLM did not return valid test cases or list was empty."
             logger.error(error_msg)
-            return {**state, "current_error": error_msg, "generated_test_cases": []}
+            return {"current_error": (ErrorKind.TEST_CASE_DESIGNER, error_msg), "generated_test_cases": []}
+    except (OutputParserException, ValidationError) as e:
+        error_msg = f"Test Case Designer LLM output error or malformed JSON: {e}"
+        logger.error(error_msg)
+        return {"current_error": (ErrorKind.TEST_CASE_DESIGNER, error_msg), "generated_test_cases": []}
     except Exception as e:
         logger.error(f"Test Case Designer node error: {e}", exc_info=True)
-        return {**state, "current_error": f"Test Case Designer Exception: {e}", "generated_test_cases": []}
+        return {"current_error": (ErrorKind.TEST_CASE_DESIGNER, f"Test Case Designer Exception: {e}"), "generated_test_cases": []}
     
 def critique_agent_node(state: GraphState) -> GraphState:
-    logger = logging.getLogger(__name__)
     logger.info("Entering Critique Node")
+    cfg = state["llm_models_config"]
+    critique_model = cfg.get("critique_llm", "gpt-3.5-turbo")
     code_in_question = state["generated_code"]; task_desc = state["task_description"]; planner_notes_str = state["planner_notes"]
-    test_failure_msg = state.get("test_message", "") # "" instead of N/A for easier concatenation
-    val_issues = state.get("validation_issues", [])
+    # qa_batch_runner_node puts the failure summary plus its QA interpretation in current_test_message
+    test_failed = state.get("current_test_status") not in ["success", "tool_error", None]
+    test_failure_msg = (state.get("current_test_message") or "") if test_failed else "" # "" instead of N/A for easier concatenation
+    val_issues = state.get("validation_issues") or []
     
     reason_for_critique = ""
-    if state.get("test_status") not in ["success", "tool_error", None] and test_failure_msg: 
+    if test_failure_msg: 
         reason_for_critique += f"Functional test failed: {test_failure_msg}. "
     if val_issues: 
         reason_for_critique += f"Validation issues found: {'; '.join(val_issues)}. "
 
     if not code_in_question: 
         logger.error("Critique: No code provided to critique."); 
-        return {**state, "critique": "Error: No code provided to critique.", "current_error": "Critique: No code."}
+        return {"critique": "Error: No code provided to critique.", "current_error": (ErrorKind.CRITIQUE, "Critique: No code.")}
     if not reason_for_critique.strip(): 
         # This can happen if a tool_error from dev/QA led here without a specific code issue to critique.
         # Or if validation passed but somehow routed here (graph logic error).
         logger.warning("Critique: No specific test failure or validation issue to critique. Providing general guidance.");
         critique_output = "The previous step resulted in an error or an issue that needs developer attention. Please review the logs and the task requirements carefully to identify the problem and generate corrected code."
     else:
-        logger.debug(f"Critique agent analyzing. Reason: {reason_for_critique.strip()[:150]}...")
+        logger.debug("Critique agent analyzing. Reason: %s...", reason_for_critique.strip()[:150])
         debugging_tips_context = "No debugging tips RAG context available."
-        if critique_rag_query_engine_global:
-            try: response = critique_rag_query_engine_global.query(f"Debugging tips for: {reason_for_critique.strip()}"); debugging_tips_context = str(response)
-            except Exception as e: logger.warning(f"RAG error (critique): {e}"); debugging_tips_context = f"RAG error (critique): {e}"
+        try:
+            response = cached_rag_query("critique", f"Debugging tips for: {reason_for_critique.strip()}")
+            if response is not None: debugging_tips_context = response
+        except Exception as e: logger.warning(f"RAG error (critique): {e}"); debugging_tips_context = f"RAG error (critique): {e}"
         
-        llm_critique = get_llm_instance("critique_llm", state, temperature=0.25, mock_response="Mock critique: Re-check the core logic and ensure all requirements from planner notes are met.")
-        critique_chain_instance = critique_prompt_template | llm_critique | StrOutputParser()
+        critique_chain_instance = _get_chain("critique", critique_model, 0.25, mock_response="Mock critique: Re-check the core logic and ensure all requirements from planner notes are met.")
         critique_output = critique_chain_instance.invoke({
             "task_description": task_desc, "planner_notes": planner_notes_str or "None", 
             "code_in_question": code_in_question,
-            "test_failure_message": test_failure_msg if state.get("test_status") != "success" else "N/A",
+            "test_failure_message": test_failure_msg or "N/A",
             "validation_issues_list": "; ".join(val_issues) if val_issues else "N/A", 
             "debugging_tips_context": debugging_tips_context
         })
         
     logger.info(f"Generated Critique: {critique_output}. Exiting Critique Node.")
-    updated_feedback_history = list(state.get("feedback_history", []))
+    new_feedback = []
     # Add the current raw test message and validation issues to feedback history before the new critique
-    if test_failure_msg: updated_feedback_history.append(f"Raw Test Failure (DevAttempt {state['refinement_count']}): {test_failure_msg}")
-    if val_issues: updated_feedback_history.append(f"Raw Validation Issues (DevAttempt {state['refinement_count']}): {'; '.join(val_issues)}")
-    updated_feedback_history.append(f"Critique on DevAttempt {state['refinement_count']}: {critique_output}")
+    if test_failure_msg: new_feedback.append(f"Raw Test Failure (DevAttempt {state['refinement_count']}): {test_failure_msg}")
+    if val_issues: new_feedback.append(f"Raw Validation Issues (DevAttempt {state['refinement_count']}): {'; '.join(val_issues)}")
+    new_feedback.append(f"Critique on DevAttempt {state['refinement_count']}: {critique_output}")
     
-    return {**state, "critique": critique_output, "current_error": None, "feedback_history": updated_feedback_history}
-
-
-
-class SimpleJsonOutputParser(StrOutputParser):
-    def parse(self, text:str) -> Any:
-        # Try to extract JSON from ```json ... ``` markdown block
-        match_md = re.search(r"```json\n(.*?)\n```", text, re.DOTALL)
-        if match_md:
-            json_text = match_md.group(1).strip()
-        else:
-            # If no markdown, assume the whole text is JSON or attempt to find JSON object within text
-            match_obj = re.search(r"\{.*\}", text, re.DOTALL)
-            if match_obj:
-                json_text = match_obj.group(0)
-            else: # No clear JSON object found
-                logger.error(f"JSON Parser: No JSON block or object found in text: {text[:200]}...")
-                return {"error": "JSON parsing failed: No JSON found", "raw_text": text}
-        try:
-            return json.loads(json_text)
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON Parser Error: {e} in JSON text: {json_text[:200]}...")
-            return {"error": f"JSON parsing failed: {e}", "raw_json_text": json_text, "original_text": text}
+    return {"critique": critique_output, "current_error": None, "feedback_history": new_feedback}
@@ -3,18 +3,25 @@ import shutil
 import os
 from pathlib import Path
 from .graph import build_graph
-from .state import GraphState
-from .rag import initialize_rag_engines, architect_rag_query_engine_global
-from main_pipeline import agents, tools, prompts, state, rag, graph
+from .state import GraphState, make_graph_state
+from .rag import initialize_rag_engines
+
+logger = logging.getLogger(__name__)
+
+# Final-state fields summarized at INFO level after a demo run; the rest (minus _DEBUG_SKIP_KEYS) go to DEBUG.
+_LOG_KEYS = frozenset({
+    "generated_code", "architectural_decision", "planned_task_description",
+    "planner_notes", "critique", "handoff_summary", "clarified_user_input",
+    "packaged_artifacts_info", "validation_issues", "feedback_history", "current_error",
+})
+_DEBUG_SKIP_KEYS = frozenset({"qa_agent_messages", "llm_models_config"})
 
 # Move initial_state to the module level for accessibility
 initial_user_req = "Can you make a python function? It should be for greeting people. Needs good docs."
-initial_state: GraphState = {
-    "initial_user_request": initial_user_req,
-    "architectural_decision": None,
-    "clarified_user_input": None, "clarification_questions_for_user": None,
-    "planner_iteration_count": 0, "max_planner_iterations": int(os.getenv("MAX_PLANNER_ITERATIONS", "2")),
-    "llm_models_config": {
+initial_state: GraphState = make_graph_state(
+    initial_user_request=initial_user_req,
+    max_planner_iterations=int(os.getenv("MAX_PLANNER_ITERATIONS", "2")),
+    llm_models_config={
         "architect_llm":  os.getenv("ARCHITECT_LLM_MODEL", "gpt-4o"),
         "planner_llm":    os.getenv("PLANNER_LLM_MODEL", "gpt-4o"),
         "developer_llm":  os.getenv("DEVELOPER_LLM_MODEL", "gpt-3.5-turbo"),
@@ -22,43 +29,38 @@ initial_state: GraphState = {
         "validation_llm": os.getenv("VALIDATION_LLM_MODEL", "gpt-3.5-turbo"),
         "critique_llm":   os.getenv("CRITIQUE_LLM_MODEL", "gpt-4o-mini")
     },
-    "task_description": "", "planned_task_description": None, "planner_notes": None,
-    "generated_test_cases": [{"function_name": "greet_user", "inputs": ("Alice",), "expected_output": "Hello, Alice!", "description": "Test greeting for Alice"}],
-    "current_test_case_index": 0,
-    "all_tests_passed": False,
-    "generated_code": None, "current_test_status": None, "current_test_message": None, "critique": None,
-    "validation_status": None, "validation_issues": [],
-    "test_results_summary": [],
-    "packaged_artifacts_info": None, "handoff_summary": None,
-    "feedback_history": [], "refinement_count": 0, "max_refinements": int(os.getenv("MAX_REFINEMENTS", "3")),
-    "current_error": None, "qa_agent_messages": []
-}
+    generated_test_cases=[{"function_name": "greet_user", "inputs": ("Alice",), "expected_output": "Hello, Alice!", "description": "Test greeting for Alice"}],
+    max_refinements=int(os.getenv("MAX_REFINEMENTS", "3")),
+    max_parallel_agents=int(os.getenv("MAX_PARALLEL_AGENTS", "4")),
+)
 
 def run_demo(cleanup_artifacts=True):
-    logger = logging.getLogger(__name__)
     logger.info("🚀 Starting Autonomous Code Generation Demo (with Architect Agent) 🚀")
     ARTIFACTS_BASE_DIR = Path("output_artifacts_demo")
-    if cleanup_artifacts and ARTIFACTS_BASE_DIR.exists():
+    if cleanup_artifacts and ARTIFACTS_BASE_DIR.exists() and any(ARTIFACTS_BASE_DIR.iterdir()):
         logger.info(f"Cleaning up previous artifacts in {ARTIFACTS_BASE_DIR}...")
         shutil.rmtree(ARTIFACTS_BASE_DIR)
-    ARTIFACTS_BASE_DIR.mkdir(parents=True, exist_ok=True)
-    if architect_rag_query_engine_global is None:
-        initialize_rag_engines()
+    if not ARTIFACTS_BASE_DIR.is_dir():
+        ARTIFACTS_BASE_DIR.mkdir(parents=True, exist_ok=True)
+    initialize_rag_engines()
     if not os.getenv("OPENAI_API_KEY"):
         logger.warning("OPENAI_API_KEY not found in environment. LLM calls may fail or use mocks.")
     logger.info(f"Using LLM Configuration: {initial_state['llm_models_config']}")
     logger.info(f"Max Developer Refinements: {initial_state['max_refinements']}, Max Planner Iterations: {initial_state['max_planner_iterations']}")
-    app = build_graph()
+    app = build_graph(max_refinements=initial_state['max_refinements'], max_planner_iterations=initial_state['max_planner_iterations'])
     logger.info("Invoking the graph...")
     final_state = app.invoke(initial_state)
     logger.info("🏁 Demo Finished. Final State (Key Fields): 🏁")
-    for key, value in final_state.items():
-        if key in ["generated_code", "architectural_decision", "planned_task_description", 
-                   "planner_notes", "critique", "handoff_summary", "clarified_user_input", 
-                   "packaged_artifacts_info", "validation_issues", "feedback_history", "current_error"] and value:
-             logger.info(f"  {key}: {value}")
-        elif key not in ["qa_agent_messages", "llm_models_config"] and value is not None :
-             logger.debug(f"  {key}: {value}")
+    if logger.isEnabledFor(logging.INFO):
+        for key in sorted(_LOG_KEYS & final_state.keys()):
+            value = final_state[key]
+            if value:
+                logger.info("  %s: %s", key, value)
+    if logger.isEnabledFor(logging.DEBUG):
+        for key in sorted(final_state.keys() - _LOG_KEYS - _DEBUG_SKIP_KEYS):
+            value = final_state[key]
+            if value is not None:
+                logger.debug("  %s: %s", key, value)
     logger.info("--- End-to-End Demo Test Verification ---")
     final_success = (final_state.get("current_test_status") == "success" and
                      final_state.get("validation_status") == "pass" and
@@ -73,7 +75,8 @@ def run_demo(cleanup_artifacts=True):
         else:
             logger.warning("⚠️ WARNING: Artifact code file not found where expected.")
     elif final_state.get("current_error"):
-        logger.error(f"❌ FAILED: Pipeline ended with error: {final_state.get('current_error')}")
+        error_kind, error_message = final_state["current_error"]
+        logger.error(f"❌ FAILED: Pipeline ended with {error_kind.value} error: {error_message}")
     else:
         logger.error(f"❌ FAILED: Pipeline did not complete successfully. Final Test: {final_state.get('current_test_status')}, Validation: {final_state.get('validation_status')}")
     return final_state
\ No newline at end of file
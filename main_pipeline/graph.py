@@ -1,15 +1,32 @@
-from .agents import (
-    architect_agent_node, planner_agent_node, developer_agent_node, qa_agent_node,
-    validation_agent_node, critique_agent_node, test_case_designer_node
-)
-from .state import GraphState
+from .state import GraphState, ErrorKind
 from langgraph.graph import StateGraph, END
+from langchain_core.runnables import RunnableLambda
+from collections import deque
+from typing import Optional, Set, Tuple
+import functools
 import logging
 
 # Graph assembly, routers, and build_graph
 
+logger = logging.getLogger(__name__)
+
+ENTRY_NODE = "architect_agent_node"
+# Error kinds that end the run as soon as a router sees them.
+UPSTREAM_ERROR_KINDS = frozenset({ErrorKind.ARCHITECT, ErrorKind.PLANNER})
+# (current_test_status, error kind) -> node that retries a failed QA pass; anything else goes to critique.
+QA_RETRY_NODES = {("tool_error", ErrorKind.DEVELOPER): "developer_agent_node"}
+
+def _error_kind(state):
+    current_error = state.get("current_error")
+    return current_error[0] if current_error else None
+
+@functools.lru_cache(maxsize=None)
+def _refinement_route(ref_count: int, max_ref: int, retry_node: str) -> str:
+    """Retry via retry_node while refinement budget remains, otherwise end the run."""
+    return retry_node if ref_count < max_ref else END
+
 def decide_after_architect(state):
-    if state.get("current_error") and "Architect Error" in state.get("current_error", ""):
+    if _error_kind(state) == ErrorKind.ARCHITECT:
         return END
     if state.get("architectural_decision") and state["architectural_decision"].get("chosen_language"):
         return "planner_agent_node"
@@ -17,7 +34,7 @@ def decide_after_architect(state):
         return END
 
 def decide_after_planner(state):
-    if state.get("current_error") and "Planner Error" in state.get("current_error", ""):
+    if _error_kind(state) == ErrorKind.PLANNER:
         return END
     questions = state.get("clarification_questions_for_user")
     planner_iters = state.get("planner_iteration_count", 0)
@@ -32,7 +49,7 @@ def decide_after_planner(state):
         return END
 
 def decide_after_test_case_designer(state):
-    if state.get("current_error") and "Test Case Designer" in state.get("current_error", ""):
+    if _error_kind(state) == ErrorKind.TEST_CASE_DESIGNER:
         return END
     if state.get("generated_test_cases") and len(state["generated_test_cases"]) > 0:
         return "developer_agent_node"
@@ -43,15 +60,12 @@ def decide_after_qa(state):
     test_status = state["current_test_status"]
     ref_count = state["refinement_count"]
     max_ref = state["max_refinements"]
-    if state.get("current_error") and ("Architect Error" in state.get("current_error","") or "Planner Error" in state.get("current_error","") ):
+    error_kind = _error_kind(state)
+    if error_kind in UPSTREAM_ERROR_KINDS:
         return END
-    if test_status == "success":
+    if state.get("all_tests_passed"):
         return "validation_agent_node"
-    if test_status == "tool_error":
-        if state.get("current_error") and ("Developer agent" in state.get("current_error","") or "No parsable code" in state.get("current_error","") ):
-            return "developer_agent_node" if ref_count < max_ref else END
-        return "critique_agent_node" if ref_count < max_ref else END
-    return "critique_agent_node" if ref_count < max_ref else END
+    return _refinement_route(ref_count, max_ref, QA_RETRY_NODES.get((test_status, error_kind), "critique_agent_node"))
 
 def decide_after_validation(state):
     validation_status = state["validation_status"]
@@ -62,10 +76,17 @@ def decide_after_validation(state):
     elif validation_status == "error":
         return END
     else:
-        return "critique_agent_node" if ref_count < max_ref else END
+        return _refinement_route(ref_count, max_ref, "critique_agent_node")
+
+def decide_after_post_dev(state):
+    """QA and validation ran together: a QA failure routes first, otherwise the validation verdict decides."""
+    qa_route = decide_after_qa(state)
+    if qa_route != "validation_agent_node":
+        return qa_route
+    return decide_after_validation(state)
 
 def decide_after_packaging(state):
-    if state.get("current_error") and "Packaging Error" in state.get("current_error", ""):
+    if _error_kind(state) == ErrorKind.PACKAGING:
         return END
     elif state.get("packaged_artifacts_info"):
         return "handoff_node"
@@ -74,52 +95,97 @@ def decide_after_packaging(state):
 
 # Define the artifact_packaging_node function
 def artifact_packaging_node(state: GraphState) -> GraphState:
-    logger = logging.getLogger(__name__)
     logger.info("Entering Artifact Packaging Node")
     # Example logic for packaging artifacts (replace with actual implementation)
     packaged_artifacts_info = {"code_file": "output.py", "documentation": "README.md"}
     logger.info(f"Packaged artifacts: {packaged_artifacts_info}")
-    return {**state, "packaged_artifacts_info": packaged_artifacts_info, "current_error": None}
+    return {"packaged_artifacts_info": packaged_artifacts_info, "current_error": None}
 
 # Define the handoff_node function
 def handoff_node(state: GraphState) -> GraphState:
-    logger = logging.getLogger(__name__)
     logger.info("Entering Handoff Node")
     # Example logic for handoff (replace with actual implementation)
     handoff_summary = "Artifacts successfully handed off to the next stage."
     logger.info(f"Handoff summary: {handoff_summary}")
-    return {**state, "handoff_summary": handoff_summary, "current_error": None}
+    return {"handoff_summary": handoff_summary, "current_error": None}
+
+# Router return value -> destination node for each conditional edge, built once at import time.
+ARCHITECT_ROUTES = {"planner_agent_node": "planner_agent_node", END: END}
+PLANNER_ROUTES = {"human_interaction_node": "human_interaction_node", "test_case_designer_node": "test_case_designer_node", END: END}
+TEST_CASE_DESIGNER_ROUTES = {"developer_agent_node": "developer_agent_node", END: END}
+POST_DEV_ROUTES = {"artifact_packaging_node": "artifact_packaging_node", "critique_agent_node": "critique_agent_node",
+                   "developer_agent_node": "developer_agent_node", END: END}
+PACKAGING_ROUTES = {"handoff_node": "handoff_node", END: END}
+
+def _pruned_edges(max_refinements: Optional[int], max_planner_iterations: Optional[int]) -> Set[Tuple[str, str]]:
+    """(source, target) edges the given limits make untakeable. Nodes increment their counters before
+    the router compares them, so a branch back needs a limit of at least 2 to ever be taken."""
+    pruned = set()
+    if max_planner_iterations is not None and max_planner_iterations < 2:
+        pruned.add(("planner_agent_node", "human_interaction_node"))
+    if max_refinements is not None and max_refinements < 2:
+        pruned |= {("post_dev_super_node", "critique_agent_node"), ("post_dev_super_node", "developer_agent_node")}
+    return pruned
 
-def build_graph():
+def build_graph(max_refinements: Optional[int] = None, max_planner_iterations: Optional[int] = None):
+    """Assemble and compile the pipeline graph. When the run's limits are passed, branches they make
+    unreachable (critique/refinement loop, HITL clarification) are left out of the compiled graph."""
+    # Imported here so router-only users of this module don't load LangChain, model clients and RAG.
+    from .agents import (
+        architect_agent_node, planner_agent_node, developer_agent_node, post_dev_super_node, apost_dev_super_node,
+        critique_agent_node, test_case_designer_node
+    )
+    nodes = {
+        "architect_agent_node": architect_agent_node,
+        "planner_agent_node": planner_agent_node,
+        "human_interaction_node": lambda state: {},  # Placeholder for HITL node; echoing the state would re-append reducer fields
+        "test_case_designer_node": test_case_designer_node,
+        "developer_agent_node": developer_agent_node,
+        # QA and validation run concurrently; the async variant is used by astream/ainvoke.
+        "post_dev_super_node": RunnableLambda(post_dev_super_node, afunc=apost_dev_super_node, name="post_dev_super_node"),
+        "critique_agent_node": critique_agent_node,
+        "artifact_packaging_node": artifact_packaging_node,
+        "handoff_node": handoff_node,
+    }
+    conditional_edges = {
+        "architect_agent_node": (decide_after_architect, ARCHITECT_ROUTES),
+        "planner_agent_node": (decide_after_planner, PLANNER_ROUTES),
+        "test_case_designer_node": (decide_after_test_case_designer, TEST_CASE_DESIGNER_ROUTES),
+        "post_dev_super_node": (decide_after_post_dev, POST_DEV_ROUTES),
+        "artifact_packaging_node": (decide_after_packaging, PACKAGING_ROUTES),
+    }
+    direct_edges = {
+        "human_interaction_node": "planner_agent_node",
+        "developer_agent_node": "post_dev_super_node",
+        "critique_agent_node": "developer_agent_node",
+        "handoff_node": END,
+    }
+    pruned = _pruned_edges(max_refinements, max_planner_iterations)
+    conditional_edges = {source: (router, {key: target for key, target in routes.items() if (source, target) not in pruned})
+                         for source, (router, routes) in conditional_edges.items()}
+    # Keep only nodes reachable from the entry point over the remaining edges.
+    reachable, frontier = set(), deque([ENTRY_NODE])
+    while frontier:
+        node = frontier.popleft()
+        if node == END or node in reachable:
+            continue
+        reachable.add(node)
+        if node in conditional_edges:
+            frontier.extend(conditional_edges[node][1].values())
+        if node in direct_edges:
+            frontier.append(direct_edges[node])
+    if len(reachable) < len(nodes):
+        logger.info(f"Pruned unreachable nodes: {sorted(set(nodes) - reachable)}")
     workflow = StateGraph(GraphState)
-    workflow.add_node("architect_agent_node", architect_agent_node)
-    workflow.add_node("planner_agent_node", planner_agent_node)
-    workflow.add_node("human_interaction_node", lambda state: state)  # Placeholder for HITL node
-    workflow.add_node("test_case_designer_node", test_case_designer_node)
-    workflow.add_node("developer_agent_node", developer_agent_node)
-    workflow.add_node("qa_agent_node", qa_agent_node)
-    workflow.add_node("validation_agent_node", validation_agent_node)
-    workflow.add_node("critique_agent_node", critique_agent_node)
-    workflow.add_node("artifact_packaging_node", artifact_packaging_node)
-    workflow.add_node("handoff_node", handoff_node)
-    # Add artifact packaging and handoff nodes as needed
-    workflow.set_entry_point("architect_agent_node")
-    workflow.add_conditional_edges("architect_agent_node", decide_after_architect, 
-                                   {"planner_agent_node": "planner_agent_node", END: END})
-    workflow.add_conditional_edges("planner_agent_node", decide_after_planner, 
-                                   {"human_interaction_node": "human_interaction_node", "test_case_designer_node": "test_case_designer_node", END: END})
-    workflow.add_edge("human_interaction_node", "planner_agent_node")
-    workflow.add_conditional_edges("test_case_designer_node", decide_after_test_case_designer,
-                                   {"developer_agent_node": "developer_agent_node", END: END})
-    workflow.add_edge("developer_agent_node", "qa_agent_node")
-    workflow.add_conditional_edges("qa_agent_node", decide_after_qa, 
-                                   {"validation_agent_node": "validation_agent_node", "critique_agent_node": "critique_agent_node", 
-                                    "developer_agent_node": "developer_agent_node", END: END})
-    workflow.add_conditional_edges("validation_agent_node", decide_after_validation, 
-                                   {"artifact_packaging_node": "artifact_packaging_node", "critique_agent_node": "critique_agent_node", END: END})
-    workflow.add_conditional_edges("artifact_packaging_node", decide_after_packaging, 
-                                   {"handoff_node": "handoff_node", END: END})
-    workflow.add_edge("critique_agent_node", "developer_agent_node")
-    workflow.add_edge("handoff_node", END)
+    for name, node in nodes.items():
+        if name in reachable:
+            workflow.add_node(name, node)
+    workflow.set_entry_point(ENTRY_NODE)
+    for source, (router, routes) in conditional_edges.items():
+        if source in reachable:
+            workflow.add_conditional_edges(source, router, routes)
+    for source, target in direct_edges.items():
+        if source in reachable:
+            workflow.add_edge(source, target)
     app = workflow.compile()
-    return app
\ No newline at end of file
+    return app
@@ -1,83 +1,149 @@
+import functools
+import sys
+from typing import Final, Tuple
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
-architect_prompt_template = ChatPromptTemplate.from_messages([
-    ("system",
-     "You are a Senior Software Architect. Your role is to analyze a user request and make high-level technical decisions. "
-     "Consult the Architectural Principles provided.\n"
-     "--- BEGIN ARCHITECTURAL PRINCIPLES ---\n{architectural_principles_context}\n--- END ARCHITECTURAL PRINCIPLES ---\n"
-     "Based on the user request and these principles, determine the 'chosen_language' (e.g., 'python'), "
-     "'framework_hint' (e.g., 'standard_library', 'flask', 'pyspark'), and provide 'high_level_notes' for the planning agent. "
-     "For current MVP scope, assume Python and standard libraries are preferred for simple function requests. "
-     "Output ONLY a valid JSON object with these three keys: 'chosen_language', 'framework_hint', 'high_level_notes'. Do not include any other text or markdown."),
+# System messages put their static instructions first and per-call context (RAG results, upstream
+# decisions) last, so repeated calls share the longest possible prompt prefix for provider-side caching.
+# Prompt messages are kept as hashable (role, content) tuples so compiled templates can be memoized.
+# The placeholder roles stand in for MessagesPlaceholder(variable_name=content).
+# System texts are interned Final constants so every template and formatted message shares one copy.
+PLACEHOLDER_ROLE = "placeholder"
+OPTIONAL_PLACEHOLDER_ROLE = "optional_placeholder"
+
+@functools.lru_cache(maxsize=None)
+def build_prompt_template(messages: Tuple[Tuple[str, str], ...]) -> ChatPromptTemplate:
+    return ChatPromptTemplate.from_messages([
+        MessagesPlaceholder(variable_name=content, optional=role == OPTIONAL_PLACEHOLDER_ROLE)
+        if role in (PLACEHOLDER_ROLE, OPTIONAL_PLACEHOLDER_ROLE) else (role, content)
+        for role, content in messages
+    ])
+
+_ARCHITECT_SYSTEM: Final[str] = sys.intern(
+    "You are a Senior Software Architect. Your role is to analyze a user request and make high-level technical decisions. "
+    "Based on the user request and the Architectural Principles provided below, determine the 'chosen_language' (e.g., 'python'), "
+    "'framework_hint' (e.g., 'standard_library', 'flask', 'pyspark'), and provide 'high_level_notes' for the planning agent. "
+    "For current MVP scope, assume Python and standard libraries are preferred for simple function requests. "
+    "Output ONLY a valid JSON object with these three keys: 'chosen_language', 'framework_hint', 'high_level_notes'. Do not include any other text or markdown.\n"
+    "--- BEGIN ARCHITECTURAL PRINCIPLES ---\n{architectural_principles_context}\n--- END ARCHITECTURAL PRINCIPLES ---"
+)
+
+ARCHITECT_PROMPT_MESSAGES = (
+    ("system", _ARCHITECT_SYSTEM),
     ("human", "User Request: {user_request}")
-])
-
-planner_prompt_template = ChatPromptTemplate.from_messages([
-    ("system",
-     "You are an expert requirements analyst and planner. Your goal is to refine a user request into a clear, actionable task for a developer. "
-     "You have received an architectural decision: Language='{chosen_language}', Framework Hint='{framework_hint}', Architect Notes='{architect_notes}'. "
-     "Incorporate these into your planning. Consult Planning Guidelines.\n"
-     "--- BEGIN PLANNING GUIDELINES ---\n{planning_guidelines_context}\n--- END PLANNING GUIDELINES ---\n"
-     "If the user request (considering architect's input) is clear enough to define a single function in the chosen language, output ONLY a valid JSON object with 'planned_task_description', 'planner_notes', and an empty 'clarification_questions' list (e.g., `[]`).\n"
-     "If ambiguous, output ONLY a valid JSON object with a list of specific 'clarification_questions' for the user, and set 'planned_task_description' and 'planner_notes' to null or omit them. "
-     "The 'planned_task_description' should be very specific about the function name, parameters (with types), return type, and expected behavior."),
+)
+
+_PLANNER_SYSTEM: Final[str] = sys.intern(
+    "You are an expert requirements analyst and planner. Your goal is to refine a user request into a clear, actionable task for a developer. "
+    "Incorporate the architectural decision and Planning Guidelines provided below into your planning.\n"
+    "If the user request (considering architect's input) is clear enough to define a single function in the chosen language, output ONLY a valid JSON object with 'planned_task_description', 'planner_notes', and an empty 'clarification_questions' list (e.g., `[]`).\n"
+    "If ambiguous, output ONLY a valid JSON object with a list of specific 'clarification_questions' for the user, and set 'planned_task_description' and 'planner_notes' to null or omit them. "
+    "The 'planned_task_description' should be very specific about the function name, parameters (with types), return type, and expected behavior.\n"
+    "--- BEGIN PLANNING GUIDELINES ---\n{planning_guidelines_context}\n--- END PLANNING GUIDELINES ---\n"
+    "Architectural decision: Language='{chosen_language}', Framework Hint='{framework_hint}', Architect Notes='{architect_notes}'."
+)
+
+PLANNER_PROMPT_MESSAGES = (
+    ("system", _PLANNER_SYSTEM),
     ("human", "User Request to process (already incorporates architect's context implicitly): {user_request_to_process}")
-])
-
-dev_code_gen_prompt_template = ChatPromptTemplate.from_messages([
-    ("system", "You are an expert Python coding assistant. Your task is to write or revise Python function code based on the provided task description and feedback. "
-               "ONLY output the Python code block for the function itself, enclosed in ```python ... ```. "
-               "Adhere strictly to the coding standards and planner notes.\n"
-               "--- BEGIN CODING STANDARDS ---\n{coding_standards_context}\n--- END CODING STANDARDS ---\n"
-               "Planner Notes: {developer_notes}\n\n"
-               "Focus on addressing the LATEST critique and test failure/validation messages. Previous feedback history is for context only."),
+)
+
+_DEV_CODE_GEN_SYSTEM: Final[str] = sys.intern(
+    "You are an expert Python coding assistant. Your task is to write or revise Python function code based on the provided task description and feedback. "
+    "ONLY output the Python code block for the function itself, enclosed in ```python ... ```. "
+    "Adhere strictly to the coding standards and planner notes below. "
+    "Focus on addressing the LATEST critique and test failure/validation messages. Previous feedback history is for context only.\n"
+    "--- BEGIN CODING STANDARDS ---\n{coding_standards_context}\n--- END CODING STANDARDS ---\n"
+    "Planner Notes: {developer_notes}"
+)
+
+DEV_CODE_GEN_PROMPT_MESSAGES = (
+    ("system", _DEV_CODE_GEN_SYSTEM),
     ("human", "Task: {developer_task_description}\n\n"
               "--- LATEST FEEDBACK TO ADDRESS ---\n"
               "Critique: {critique_message}\n"
               "--- END LATEST FEEDBACK ---\n\n"
               "Full Feedback History (for context, if any errors persist from these, address them too):\n{full_feedback_history}\n\n"
-              "Please generate the revised code.")])
-
-validation_prompt_template = ChatPromptTemplate.from_messages([
-    ("system", "You are a code validation agent. Your task is to review Python code for security vulnerabilities and compliance with project standards. "
-               "Consult the provided Validation Rules.\n"
-               "--- BEGIN VALIDATION RULES ---\n{validation_rules_context}\n--- END VALIDATION RULES ---\n"
-               "Analyze the code against these rules and the task description. "
-               "Output ONLY a valid JSON object with two keys: 'validation_passed' (boolean: true if no issues, false if any issues are found) and 'issues_found' (a list of strings, where each string describes a specific issue found; empty if validation_passed is true)."),
-    ("human", "Task Description: {task_description}\nPlanner Notes: {planner_notes}\nCode to Validate:\n```python\n{code_to_validate}\n```\n\nPlease perform validation.")])
-
-critique_prompt_template = ChatPromptTemplate.from_messages([
-    ("system", "You are a code critique agent. Analyze failed code OR code with validation issues. Provide constructive feedback for a developer. "
-               "Focus on the root cause and suggest specific changes. Consult debugging tips if relevant.\n"
-               "--- BEGIN DEBUGGING TIPS ---\n{debugging_tips_context}\n--- END DEBUGGING TIPS ---\n"
-               "Provide a concise critique (1-3 sentences). Do not rewrite the code yourself."),
-    ("human", "Task Description: {task_description}\nPlanner Notes: {planner_notes}\nCode in Question:\n```python\n{code_in_question}\n```\nTest Failure Message (if any): {test_failure_message}\nValidation Issues (if any): {validation_issues_list}\n\nPlease provide a critique and suggestions for the developer based on any available failure or validation issues.")])
-
-test_case_designer_prompt_template = ChatPromptTemplate.from_messages([
-    ("system",
-     "You are a Test Case Designer. Your task is to create a diverse set of 3-5 test cases for a given Python function description. "
-     "Each test case should include: "
-     "1. 'function_name': The name of the function to be tested (extract or infer from description). "
-     "2. 'inputs': A tuple of input values for the function. "
-     "3. 'expected_output': The expected output when the function is called with these inputs. "
-     "4. 'description': A brief (1-sentence) explanation of what this test case covers (e.g., 'tests edge case with empty string', 'tests typical positive numbers')."
-     "Consider typical cases, edge cases (empty inputs, zero, negative numbers if applicable), and potentially type variations if not strictly defined. "
-     "Output ONLY a valid JSON object with a single key 'test_cases', which is a list of these test case objects. "
-     "Example: {'test_cases': [{'function_name': 'add', 'inputs': (1,2), 'expected_output': 3, 'description': 'Test with positive integers.'}, ...]}"
-     ),
+              "Please generate the revised code."))
+
+_VALIDATION_SYSTEM: Final[str] = sys.intern(
+    "You are a code validation agent. Your task is to review Python code for security vulnerabilities and compliance with project standards. "
+    "Analyze the code against the Validation Rules provided below and the task description. "
+    "Output ONLY a valid JSON object with two keys: 'validation_passed' (boolean: true if no issues, false if any issues are found) and 'issues_found' (a list of strings, where each string describes a specific issue found; empty if validation_passed is true).\n"
+    "--- BEGIN VALIDATION RULES ---\n{validation_rules_context}\n--- END VALIDATION RULES ---"
+)
+
+VALIDATION_PROMPT_MESSAGES = (
+    ("system", _VALIDATION_SYSTEM),
+    ("human", "Task Description: {task_description}\nPlanner Notes: {planner_notes}\nCode to Validate:\n```python\n{code_to_validate}\n```\n\nPlease perform validation."))
+
+_CRITIQUE_SYSTEM: Final[str] = sys.intern(
+    "You are a code critique agent. Analyze failed code OR code with validation issues. Provide constructive feedback for a developer. "
+    "Focus on the root cause and suggest specific changes. Consult the debugging tips below if relevant. "
+    "Provide a concise critique (1-3 sentences). Do not rewrite the code yourself.\n"
+    "--- BEGIN DEBUGGING TIPS ---\n{debugging_tips_context}\n--- END DEBUGGING TIPS ---"
+)
+
+CRITIQUE_PROMPT_MESSAGES = (
+    ("system", _CRITIQUE_SYSTEM),
+    ("human", "Task Description: {task_description}\nPlanner Notes: {planner_notes}\nCode in Question:\n```python\n{code_in_question}\n```\nTest Failure Message (if any): {test_failure_message}\nValidation Issues (if any): {validation_issues_list}\n\nPlease provide a critique and suggestions for the developer based on any available failure or validation issues."))
+
+_TEST_CASE_DESIGNER_SYSTEM: Final[str] = sys.intern(
+    "You are a Test Case Designer. Your task is to create a diverse set of 3-5 test cases for a given Python function description. "
+    "Each test case should include: "
+    "1. 'function_name': The name of the function to be tested (extract or infer from description). "
+    "2. 'inputs': A tuple of input values for the function. "
+    "3. 'expected_output': The expected output when the function is called with these inputs. "
+    "4. 'description': A brief (1-sentence) explanation of what this test case covers (e.g., 'tests edge case with empty string', 'tests typical positive numbers')."
+    "Consider typical cases, edge cases (empty inputs, zero, negative numbers if applicable), and potentially type variations if not strictly defined. "
+    "Output ONLY a valid JSON object with a single key 'test_cases', which is a list of these test case objects. "
+    "Example: {{\"test_cases\": [{{\"function_name\": \"add\", \"inputs\": [1, 2], \"expected_output\": 3, \"description\": \"Test with positive integers.\"}}, ...]}}"
+)
+
+TEST_CASE_DESIGNER_PROMPT_MESSAGES = (
+    ("system", _TEST_CASE_DESIGNER_SYSTEM),
     ("human", "Function Description: {function_description}\nPlanner Notes (for context): {planner_notes}")
-])
-
-qa_agent_prompt = ChatPromptTemplate.from_messages([
-    ("system", "You are a meticulous QA agent. Your primary responsibility is to assess Python code provided by a developer. "
-               "You have access to a 'code_tester_tool'. "
-               "1. Review the code against the task description and specific test case. "
-               "2. Decide if the 'code_tester_tool' is appropriate to use. If so, determine the correct arguments for it. "
-               "   The tool requires: 'code_string', 'function_name', 'test_inputs', and 'expected_output'. "
-               "3. Execute the tool with these arguments to get a definitive pass/fail result. "
-               "4. Report the outcome based on the tool's execution. "
-               "Do not attempt to fix the code yourself or simulate the test. Your role is to correctly invoke the testing tool and interpret its results."),
-    MessagesPlaceholder(variable_name="chat_history", optional=True),
-    ("human", "Task Description (from planner): {task_description_for_qa}\nTest Case: Function '{function_name}' with inputs {test_inputs} should produce {expected_output}.\nDeveloper's Generated Code to Test:\n```python\n{generated_code}\n```\n\nPlease make a decision on testing, use the 'code_tester_tool' appropriately, and report the precise outcome."),
-    MessagesPlaceholder(variable_name="agent_scratchpad"),
-])
\ No newline at end of file
+)
+
+_QA_AGENT_SYSTEM: Final[str] = sys.intern(
+    "You are a meticulous QA agent. The developer's Python code has already been run against every test case with a code tester; "
+    "you are given the failing cases with their exact tester output. "
+    "1. Identify the root cause(s) that explain the failures, grouping cases that fail for the same reason. "
+    "2. Point to the specific lines or logic in the code responsible. "
+    "Be concise. Do not rewrite the code and do not re-run or simulate the tests; the tester output is authoritative."
+)
+
+QA_AGENT_PROMPT_MESSAGES = (
+    ("system", _QA_AGENT_SYSTEM),
+    ("human", "Task Description (from planner): {task_description_for_qa}\nDeveloper's Generated Code:\n```python\n{generated_code}\n```\n"
+              "Test Results: {passed_count}/{total_count} passed. Failing cases:\n{failure_summary}"),
+)
+
+def get_architect_prompt() -> ChatPromptTemplate:
+    return build_prompt_template(ARCHITECT_PROMPT_MESSAGES)
+
+def get_planner_prompt() -> ChatPromptTemplate:
+    return build_prompt_template(PLANNER_PROMPT_MESSAGES)
+
+def get_dev_code_gen_prompt() -> ChatPromptTemplate:
+    return build_prompt_template(DEV_CODE_GEN_PROMPT_MESSAGES)
+
+def get_validation_prompt() -> ChatPromptTemplate:
+    return build_prompt_template(VALIDATION_PROMPT_MESSAGES)
+
+def get_critique_prompt() -> ChatPromptTemplate:
+    return build_prompt_template(CRITIQUE_PROMPT_MESSAGES)
+
+def get_test_case_designer_prompt() -> ChatPromptTemplate:
+    return build_prompt_template(TEST_CASE_DESIGNER_PROMPT_MESSAGES)
+
+def get_qa_agent_prompt() -> ChatPromptTemplate:
+    return build_prompt_template(QA_AGENT_PROMPT_MESSAGES)
+
+architect_prompt_template = get_architect_prompt()
+planner_prompt_template = get_planner_prompt()
+dev_code_gen_prompt_template = get_dev_code_gen_prompt()
+validation_prompt_template = get_validation_prompt()
+critique_prompt_template = get_critique_prompt()
+test_case_designer_prompt_template = get_test_case_designer_prompt()
+qa_agent_prompt_template = get_qa_agent_prompt()
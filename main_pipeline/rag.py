@@ -1,3 +1,5 @@
+import functools
+from typing import Optional
 
 # Define additional global variables for RAG query engines
 developer_rag_query_engine_global = None
@@ -5,11 +7,16 @@ validation_rag_query_engine_global = None
 critique_rag_query_engine_global = None
 architect_rag_query_engine_global = None
 planner_rag_query_engine_global = None
+_initialized = False
 
 # Update the initialization function to include these variables
 def initialize_rag_engines():
     global architect_rag_query_engine_global, planner_rag_query_engine_global
     global developer_rag_query_engine_global, validation_rag_query_engine_global, critique_rag_query_engine_global
+    global _initialized
+    # Streamlit reruns and repeated demo runs call this again; engines are built only once per process.
+    if _initialized:
+        return
 
     # Example initialization logic (replace with actual implementation)
     architect_rag_query_engine_global = "Architect RAG Engine Initialized"
@@ -23,4 +30,23 @@ def initialize_rag_engines():
     print(f"Planner: {planner_rag_query_engine_global}")
     print(f"Developer: {developer_rag_query_engine_global}")
     print(f"Validation: {validation_rag_query_engine_global}")
-    print(f"Critique: {critique_rag_query_engine_global}")
\ No newline at end of file
+    print(f"Critique: {critique_rag_query_engine_global}")
+    _initialized = True
+    cached_rag_query.cache_clear()
+
+@functools.lru_cache(maxsize=256)
+def _memoized_rag_query(engine_name: str, query: str) -> str:
+    # Only successful responses land here; exceptions propagate and are never memoized.
+    return str(globals()[f"{engine_name}_rag_query_engine_global"].query(query))
+
+def cached_rag_query(engine_name: str, query: str) -> Optional[str]:
+    """Query the named engine ("architect", "planner", "developer", "validation", "critique") and memoize
+    the response text; refinement loops repeat the same queries. Returns None when the engine is missing or
+    is still a placeholder without a query method, so callers keep their "no RAG context" fallback."""
+    engine = globals()[f"{engine_name}_rag_query_engine_global"]
+    if not hasattr(engine, "query"):
+        return None
+    return _memoized_rag_query(engine_name, query)
+
+# Kept so callers (e.g. the UI's Reset State) can clear the memo through the public function.
+cached_rag_query.cache_clear = _memoized_rag_query.cache_clear
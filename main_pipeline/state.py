@@ -1,4 +1,11 @@
-from typing import TypedDict, Optional, List, Any, Tuple, Literal, Dict
+from enum import Enum
+from typing import TypedDict, Optional, List, Any, Tuple, Literal, Dict, Annotated, get_origin, get_type_hints
+
+def extend_or_reset(existing: Optional[List], update: Optional[List]) -> List:
+    """List reducer: nodes return only new items to append, or None to clear the field for a fresh run."""
+    if update is None:
+        return []
+    return (existing or []) + update
 
 class TestCase(TypedDict):
     function_name: str
@@ -12,6 +19,16 @@ class TestResult(TypedDict):
     message: Optional[str]
     actual_output: Optional[Any]
 
+class ErrorKind(str, Enum):
+    """Which stage produced current_error; routers dispatch on it instead of parsing the message."""
+    ARCHITECT = "architect"
+    PLANNER = "planner"
+    TEST_CASE_DESIGNER = "test_case_designer"
+    DEVELOPER = "developer"
+    VALIDATION = "validation"
+    CRITIQUE = "critique"
+    PACKAGING = "packaging"
+
 class GraphState(TypedDict):
     initial_user_request: str
     architectural_decision: Optional[Dict[str, Any]]
@@ -29,14 +46,51 @@ class GraphState(TypedDict):
     generated_code: Optional[str]
     current_test_status: Optional[Literal['success', 'compilation_error', 'runtime_error', 'test_fail', 'tool_error']]
     current_test_message: Optional[str]
-    test_results_summary: List[TestResult]
+    # qa_batch_runner_node returns only the current attempt's results; the reducer appends them (None clears).
+    test_results_summary: Annotated[List[TestResult], extend_or_reset]
     critique: Optional[str]
     validation_status: Optional[Literal['pass', 'fail', 'error']]
     validation_issues: Optional[List[str]]
     packaged_artifacts_info: Optional[Dict[str, str]]
     handoff_summary: Optional[str]
-    feedback_history: List[str]
+    # Nodes return only new feedback entries; LangGraph appends them via the reducer (None clears).
+    feedback_history: Annotated[List[str], extend_or_reset]
     refinement_count: int
     max_refinements: int
-    current_error: Optional[str]
-    qa_agent_messages: List
\ No newline at end of file
+    max_parallel_agents: int
+    current_error: Optional[Tuple[ErrorKind, str]]
+    # QA interpretation messages for this run; nodes return only new messages.
+    qa_agent_messages: Annotated[List, extend_or_reset]
+
+def make_graph_state(**overrides: Any) -> GraphState:
+    """Build a complete GraphState with every field at its starting value, then apply overrides.
+    List fields get fresh lists on each call so separate runs never share them."""
+    state: GraphState = {
+        "initial_user_request": "", "architectural_decision": None,
+        "clarified_user_input": None, "clarification_questions_for_user": None,
+        "planner_iteration_count": 0, "max_planner_iterations": 2,
+        "llm_models_config": {},
+        "task_description": "", "planned_task_description": None, "planner_notes": None,
+        "generated_test_cases": None, "current_test_case_index": 0, "all_tests_passed": False,
+        "generated_code": None, "current_test_status": None, "current_test_message": None, "critique": None,
+        "validation_status": None, "validation_issues": [],
+        "test_results_summary": [],
+        "packaged_artifacts_info": None, "handoff_summary": None,
+        "feedback_history": [], "refinement_count": 0, "max_refinements": 3, "max_parallel_agents": 4,
+        "current_error": None, "qa_agent_messages": []
+    }
+    state.update(overrides)
+    return state
+
+# Fields with an extend_or_reset reducer; "updates" stream chunks carry only their new items.
+APPEND_ONLY_FIELDS = frozenset(name for name, hint in get_type_hints(GraphState, include_extras=True).items()
+                               if get_origin(hint) is Annotated)
+
+def merge_state_update(state: GraphState, update: Dict[str, Any]) -> None:
+    """Apply a node's partial update to a locally mirrored state in place, the way LangGraph's channels do."""
+    for key, value in update.items():
+        if key in APPEND_ONLY_FIELDS:
+            if value is None or value:
+                state[key] = extend_or_reset(state.get(key), None if value is None else list(value))
+        else:
+            state[key] = value
@@ -1,29 +1,201 @@
-import re
+import os
+import math
+import builtins
 import logging
-from typing import Any
+import functools
+import multiprocessing
+import multiprocessing.connection
+import pickle
+from typing import Any, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; the sandbox then runs without rlimits.
+    resource = None
+try:
+    import numpy as np
+except ImportError:  # Optional; float sequences are then compared element-wise with math.isclose.
+    np = None
 
 # Tool definitions and utility functions
 
+# (function_name, test_inputs, expected_output) for one call in a code_tester_batch run.
+TestCall = Tuple[str, tuple, Any]
+# Generated code runs in a child process with CPU/memory limits unless CODE_TESTER_SANDBOX=0.
+SANDBOX_ENABLED = os.getenv("CODE_TESTER_SANDBOX", "1") != "0"
+SANDBOX_TIMEOUT_SECONDS = int(os.getenv("CODE_TESTER_TIMEOUT", "5"))
+SANDBOX_MEMORY_LIMIT_BYTES = int(os.getenv("CODE_TESTER_MEMORY_LIMIT_MB", "512")) * 1024 * 1024
+# Builtins generated code has no business calling. This only guards against accidents, it is NOT a security
+# boundary: __import__ stays allowed for stdlib helpers, so `import io; io.open(...)` or `os.system(...)` still
+# work. Isolation comes from the sandbox process and its rlimits, not from this list.
+_DENIED_BUILTINS = frozenset({"open", "exec", "eval", "compile", "input", "breakpoint", "exit", "quit"})
+_RESTRICTED_BUILTINS = {name: value for name, value in vars(builtins).items() if name not in _DENIED_BUILTINS}
+# Fence openers for code blocks in developer output, tried in order.
+_PY_FENCE = "```python\n"
+_GENERIC_FENCE = "```\n"
+_CLOSING_FENCE = "\n```"
+
+@functools.lru_cache(maxsize=256)
+def _compile(code_string: str):
+    """Parse and compile generated code once per distinct source, so N test cases share one code object."""
+    return compile(code_string, "<gen>", "exec")
+
+# Float outputs are compared with a relative tolerance so rounding noise doesn't fail a correct function.
+FLOAT_REL_TOL = 1e-9
+FLOAT_ABS_TOL = 1e-12
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _outputs_match(actual: Any, expected_output: Any) -> Tuple[bool, str]:
+    """Compare a function's output to the expected one; returns (matched, comparator used)."""
+    try:
+        if isinstance(expected_output, float) and _is_number(actual):
+            return math.isclose(actual, expected_output, rel_tol=FLOAT_REL_TOL, abs_tol=FLOAT_ABS_TOL), "math.isclose"
+        if (isinstance(expected_output, (list, tuple)) and type(actual) is type(expected_output)
+                and any(isinstance(value, float) for value in expected_output)
+                and all(_is_number(value) for value in expected_output) and all(_is_number(value) for value in actual)):
+            if len(actual) != len(expected_output):
+                return False, "length"
+            if np is not None:
+                return bool(np.allclose(np.asarray(actual, dtype=float), np.asarray(expected_output, dtype=float),
+                                        rtol=FLOAT_REL_TOL, atol=FLOAT_ABS_TOL)), "numpy.allclose"
+            return all(math.isclose(a, e, rel_tol=FLOAT_REL_TOL, abs_tol=FLOAT_ABS_TOL)
+                       for a, e in zip(actual, expected_output)), "math.isclose"
+    except (TypeError, ValueError):
+        pass
+    return actual == expected_output, "=="
+
+def _exec_module(code_obj) -> dict:
+    scope = {'__builtins__': _RESTRICTED_BUILTINS}; exec(code_obj, scope, scope)
+    return scope
+
+def _call_case(scope: dict, function_name: str, test_inputs: tuple, expected_output: Any) -> dict:
+    if function_name not in scope: return {"status": "compilation_error", "message": f"Function '{function_name}' not defined."}
+    actual = scope[function_name](*test_inputs)
+    matched, comparator = _outputs_match(actual, expected_output)
+    compared_with = "" if comparator == "==" else f" (compared with {comparator})"
+    if matched: return {"status": "success", "message": f"Test passed{compared_with}.", "actual_output": actual}
+    return {"status": "test_fail", "message": f"Input: {test_inputs}, Expected: {expected_output}, Got: {actual}{compared_with}", "actual_output": actual}
+
+def _run_cases(code_obj, cases: List[TestCall]) -> Iterator[dict]:
+    """Execute the module once, then call the function once per case; yields one result per case."""
+    try:
+        scope, load_error = _exec_module(code_obj), None
+    except BaseException as e:
+        scope, load_error = None, {"status": "runtime_error", "message": str(e) or type(e).__name__}
+    for function_name, test_inputs, expected_output in cases:
+        if load_error is not None:
+            yield dict(load_error)
+            continue
+        try:
+            yield _call_case(scope, function_name, tuple(test_inputs), expected_output)
+        except BaseException as e:
+            yield {"status": "runtime_error", "message": str(e) or type(e).__name__}
+
+def _current_address_space_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def _sandboxed_worker(conn, code_string: str, cases: List[TestCall]) -> None:
+    if resource is not None:
+        # CPU budget covers the whole batch; the parent enforces the per-case wall-clock timeout.
+        cpu_limit = SANDBOX_TIMEOUT_SECONDS * max(1, len(cases))
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit, cpu_limit))
+        # The limit is headroom on top of what the interpreter already maps, not an absolute cap.
+        memory_limit = _current_address_space_bytes() + SANDBOX_MEMORY_LIMIT_BYTES
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    for result in _run_cases(_compile(code_string), cases):
+        try: pickle.dumps(result)
+        except Exception: result["actual_output"] = repr(result.get("actual_output"))
+        conn.send(result)
+    conn.close()
+
+def _sandbox_context():
+    # The caller is multithreaded (Streamlit, QA thread pool), so never fork it directly;
+    # forkserver children come from a clean single-threaded server process.
+    start_methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in start_methods else "spawn")
+
+def _run_cases_sandboxed(code_string: str, cases: List[TestCall]) -> List[dict]:
+    """Run all cases in one child; a case that hangs or kills the child fails alone and the rest resume in a new child."""
+    # Code objects don't pickle, so the child recompiles the (already syntax-checked) source.
+    ctx = _sandbox_context()
+    results: List[dict] = []
+    while len(results) < len(cases):
+        remaining = cases[len(results):]
+        reader, writer = ctx.Pipe(duplex=False)
+        process = ctx.Process(target=_sandboxed_worker, args=(writer, code_string, remaining), daemon=True)
+        process.start()
+        writer.close()
+        try:
+            for _ in remaining:
+                # Waiting on the sentinel too means a child that dies is noticed at once, not after the timeout.
+                ready = multiprocessing.connection.wait([reader, process.sentinel], timeout=SANDBOX_TIMEOUT_SECONDS)
+                if reader in ready:
+                    try:
+                        results.append(reader.recv())
+                        continue
+                    except EOFError:
+                        pass
+                if ready:
+                    process.join(SANDBOX_TIMEOUT_SECONDS)
+                    message = f"Execution crashed (exit code {process.exitcode})."
+                else:
+                    message = f"Execution timed out after {SANDBOX_TIMEOUT_SECONDS}s."
+                results.append({"status": "runtime_error", "message": message})
+                break
+        finally:
+            if process.is_alive(): process.kill()
+            process.join()
+            reader.close()
+    return results
+
+def code_tester_batch(code_string: str, cases: List[TestCall]) -> List[dict]:
+    """
+    Test several calls against one code string: the code is compiled and executed once, then each
+    (function_name, test_inputs, expected_output) case is called and compared. Returns one result dict per case.
+    """
+    if not cases: return []
+    if not code_string: return [{"status": "compilation_error", "message": "No code provided."} for _ in cases]
+    try: code_obj = _compile(code_string)
+    except SyntaxError as e: return [{"status": "compilation_error", "message": str(e)} for _ in cases]
+    try:
+        if SANDBOX_ENABLED:
+            results = _run_cases_sandboxed(code_string, cases)
+        else:
+            results = list(_run_cases(code_obj, cases))
+    except Exception as e:
+        logger.error(f"Code tester tool runtime error: {e}", exc_info=False)
+        return [{"status": "runtime_error", "message": str(e)} for _ in cases]
+    for result in results:
+        if result["status"] == "runtime_error": logger.error(f"Code tester tool runtime error: {result['message']}")
+    return results
+
 def code_tester_tool(code_string: str, function_name: str, test_inputs: tuple, expected_output: Any) -> dict:
     """
     Test a Python function by executing the provided code string, calling the function with test inputs,
     and comparing the result to the expected output. Returns a dict with status and message.
     """
-    if not code_string: return {"status": "compilation_error", "message": "No code provided."}
-    try:
-        scope = {'__builtins__': __builtins__}; exec(code_string, scope, scope)
-        if function_name not in scope: return {"status": "compilation_error", "message": f"Function '{function_name}' not defined."}
-        actual = scope[function_name](*test_inputs)
-        if actual == expected_output: return {"status": "success", "message": "Test passed.", "actual_output": actual}
-        return {"status": "test_fail", "message": f"Input: {test_inputs}, Expected: {expected_output}, Got: {actual}", "actual_output": actual}
-    except Exception as e: 
-        logging.error(f"Code tester tool runtime error: {e}", exc_info=False)
-        return {"status": "runtime_error", "message": str(e)}
+    return code_tester_batch(code_string, [(function_name, test_inputs, expected_output)])[0]
+
 
+def _fenced_block(text: str, opener: str) -> str | None:
+    """Return the body of the first block opened by `opener`, using two linear str.find scans."""
+    start = text.find(opener)
+    if start < 0:
+        return None
+    start += len(opener)
+    end = text.find(_CLOSING_FENCE, start)
+    return text[start:end] if end >= 0 else None
 
 def extract_python_code(llm_output: str) -> str | None:
-    match = re.search(r"```python\n(.*?)\n```", llm_output, re.DOTALL)
-    if match: return match.group(1).strip()
-    match = re.search(r"```\n(.*?)\n```", llm_output, re.DOTALL)
-    if match: return match.group(1).strip()
-    return None
\ No newline at end of file
+    block = _fenced_block(llm_output, _PY_FENCE)
+    if block is None:
+        block = _fenced_block(llm_output, _GENERIC_FENCE)
+    return block.strip() if block is not None else None
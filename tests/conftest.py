@@ -0,0 +1,14 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import copy
+import pytest
+from main_pipeline.state import make_graph_state
+
+# Built once per session; each test gets a shallow copy and overrides only the fields it cares about.
+_BASE_STATE = make_graph_state(initial_user_request='Test', max_refinements=2, validation_issues=None)
+
+@pytest.fixture
+def base_state():
+    return copy.copy(_BASE_STATE)
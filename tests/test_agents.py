@@ -1,10 +1,9 @@
-import sys
-import os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-
 import pytest
-from main_pipeline.state import GraphState
-from main_pipeline.agents import architect_agent_node, planner_agent_node, developer_agent_node
+import diskcache
+from types import SimpleNamespace
+from main_pipeline import agents
+from main_pipeline.agents import architect_agent_node, planner_agent_node, developer_agent_node, critique_agent_node, qa_cache_key, qa_batch_runner_node
+from main_pipeline.state import ErrorKind, merge_state_update
 
 class MockLLM:
     def __init__(self, response):
@@ -12,50 +11,109 @@ class MockLLM:
     def invoke(self, *args, **kwargs):
         return self.response
 
-def test_architect_agent_node_basic(monkeypatch):
-    # Patch get_llm_instance to return a mock LLM
-    monkeypatch.setattr('main_pipeline.agents.get_llm_instance', lambda *a, **kw: MockLLM({
+def test_architect_agent_node_basic(monkeypatch, base_state):
+    # Patch _get_chain to return a mock chain
+    monkeypatch.setattr('main_pipeline.agents._get_chain', lambda *a, **kw: MockLLM({
         'chosen_language': 'python', 'framework_hint': 'standard_library', 'high_level_notes': 'Test notes.'
     }))
-    state = GraphState(
-        initial_user_request='Test', architectural_decision=None, clarified_user_input=None,
-        clarification_questions_for_user=None, planner_iteration_count=0, max_planner_iterations=2,
-        llm_models_config={}, planned_task_description=None, planner_notes=None, task_description='',
-        generated_test_cases=None, current_test_case_index=0, all_tests_passed=False, generated_code=None,
-        current_test_status=None, current_test_message=None, test_results_summary=[], critique=None,
-        validation_status=None, validation_issues=None, packaged_artifacts_info=None, handoff_summary=None,
-        feedback_history=[], refinement_count=0, max_refinements=2, current_error=None, qa_agent_messages=[]
-    )
+    state = base_state
     result = architect_agent_node(state)
     assert result['architectural_decision']['chosen_language'] == 'python'
 
-def test_planner_agent_node_clarification(monkeypatch):
-    monkeypatch.setattr('main_pipeline.agents.get_llm_instance', lambda *a, **kw: MockLLM({
+def test_planner_agent_node_clarification(monkeypatch, base_state):
+    monkeypatch.setattr('main_pipeline.agents._get_chain', lambda *a, **kw: MockLLM({
         'clarification_questions': ['What should the function return?'], 'planned_task_description': None, 'planner_notes': None
     }))
-    state = GraphState(
-        initial_user_request='Test', architectural_decision={'chosen_language': 'python', 'framework_hint': 'standard_library', 'high_level_notes': 'Test'}, clarified_user_input=None,
-        clarification_questions_for_user=None, planner_iteration_count=0, max_planner_iterations=2,
-        llm_models_config={}, planned_task_description=None, planner_notes=None, task_description='',
-        generated_test_cases=None, current_test_case_index=0, all_tests_passed=False, generated_code=None,
-        current_test_status=None, current_test_message=None, test_results_summary=[], critique=None,
-        validation_status=None, validation_issues=None, packaged_artifacts_info=None, handoff_summary=None,
-        feedback_history=[], refinement_count=0, max_refinements=2, current_error=None, qa_agent_messages=[]
-    )
+    state = dict(base_state, architectural_decision={'chosen_language': 'python', 'framework_hint': 'standard_library', 'high_level_notes': 'Test'})
     result = planner_agent_node(state)
     assert result['clarification_questions_for_user'] == ['What should the function return?']
 
-def test_developer_agent_node_success(monkeypatch):
-    monkeypatch.setattr('main_pipeline.agents.get_llm_instance', lambda *a, **kw: MockLLM('''```python\ndef foo():\n    return 42\n```'''))
+def test_developer_agent_node_success(monkeypatch, base_state):
+    monkeypatch.setattr('main_pipeline.agents._get_chain', lambda *a, **kw: MockLLM('''```python\ndef foo():\n    return 42\n```'''))
     monkeypatch.setattr('main_pipeline.agents.extract_python_code', lambda x: 'def foo():\n    return 42')
-    state = GraphState(
-        initial_user_request='Test', architectural_decision=None, clarified_user_input=None,
-        clarification_questions_for_user=None, planner_iteration_count=0, max_planner_iterations=2,
-        llm_models_config={}, planned_task_description='def foo(): return 42', planner_notes=None, task_description='def foo(): return 42',
-        generated_test_cases=None, current_test_case_index=0, all_tests_passed=False, generated_code=None,
-        current_test_status=None, current_test_message=None, test_results_summary=[], critique=None,
-        validation_status=None, validation_issues=None, packaged_artifacts_info=None, handoff_summary=None,
-        feedback_history=[], refinement_count=0, max_refinements=2, current_error=None, qa_agent_messages=[]
-    )
+    state = dict(base_state, planned_task_description='def foo(): return 42', task_description='def foo(): return 42')
     result = developer_agent_node(state)
-    assert 'def foo()' in result['generated_code']
\ No newline at end of file
+    assert 'def foo()' in result['generated_code']
+def test_critique_agent_node_uses_current_test_failure(monkeypatch, base_state):
+    prompts_seen = []
+    class RecordingLLM(MockLLM):
+        def invoke(self, inputs, *args, **kwargs):
+            prompts_seen.append(inputs)
+            return self.response
+    monkeypatch.setattr('main_pipeline.agents._get_chain', lambda *a, **kw: RecordingLLM('Fix the off-by-one.'))
+    state = dict(base_state, generated_code='def foo():\n    return 41', task_description='Return 42', planner_notes='',
+                 current_test_status='test_fail', current_test_message='- foo: [test_fail] Expected 42, Got 41', refinement_count=1)
+    result = critique_agent_node(state)
+    assert prompts_seen[0]['test_failure_message'] == '- foo: [test_fail] Expected 42, Got 41'
+    assert result['critique'] == 'Fix the off-by-one.'
+    assert result['feedback_history'][0].startswith('Raw Test Failure (DevAttempt 1)')
+
+ADD_CASE = {'function_name': 'add', 'inputs': [2, 3], 'expected_output': 5, 'description': 'adds'}
+
+@pytest.fixture
+def fake_tester(monkeypatch, tmp_path):
+    """Point the QA cache at tmp_path and replace code_tester_batch with a recorder; set .status to change its verdict."""
+    monkeypatch.setattr('main_pipeline.agents.QA_CACHE_DIR', str(tmp_path / 'qa_cache'))
+    recorder = SimpleNamespace(calls=[], status='success')
+    def fake_batch(code, cases):
+        recorder.calls.append(cases)
+        return [{'status': recorder.status, 'message': 'fake', 'actual_output': 5} for _ in cases]
+    monkeypatch.setattr('main_pipeline.agents.code_tester_batch', fake_batch)
+    return recorder
+
+def test_qa_cache_hit_skips_tester(fake_tester):
+    with diskcache.Cache(agents.QA_CACHE_DIR) as qa_cache:
+        first = agents._run_test_cases(qa_cache, 'def add(a, b):\n    return a + b', [ADD_CASE], 4)
+        second = agents._run_test_cases(qa_cache, 'def add(a, b):\n    return a + b', [ADD_CASE], 4)
+    assert len(fake_tester.calls) == 1
+    assert second == first
+    assert second[0]['actual_output'] == 5
+
+def test_qa_cache_does_not_store_runtime_errors(fake_tester):
+    fake_tester.status = 'runtime_error'
+    with diskcache.Cache(agents.QA_CACHE_DIR) as qa_cache:
+        agents._run_test_cases(qa_cache, 'def add(a, b):\n    return a + b', [ADD_CASE], 4)
+        assert len(qa_cache) == 0
+        agents._run_test_cases(qa_cache, 'def add(a, b):\n    return a + b', [ADD_CASE], 4)
+    assert len(fake_tester.calls) == 2
+
+def test_qa_cache_key_ignores_comments_and_whitespace():
+    plain = 'def add(a, b):\n    return a + b'
+    noisy = '# helper\ndef add(a,  b):\n\n    return a+b  # sum\n'
+    assert qa_cache_key(plain, ADD_CASE) == qa_cache_key(noisy, ADD_CASE)
+    assert qa_cache_key(plain, ADD_CASE) != qa_cache_key('def add(a, b):\n    return a - b', ADD_CASE)
+
+@pytest.fixture
+def qa_chain_calls(monkeypatch):
+    calls = []
+    def fake_get_chain(template_name, *args, **kwargs):
+        calls.append(template_name)
+        return MockLLM('The add function subtracts instead of adding.')
+    monkeypatch.setattr('main_pipeline.agents._get_chain', fake_get_chain)
+    return calls
+
+def test_qa_batch_runner_all_pass_skips_llm(fake_tester, qa_chain_calls, base_state):
+    state = dict(base_state, generated_code='def add(a, b):\n    return a + b', generated_test_cases=[ADD_CASE, dict(ADD_CASE, inputs=[1, 4])])
+    result = qa_batch_runner_node(state)
+    assert result['all_tests_passed'] is True
+    assert result['current_test_status'] == 'success'
+    assert qa_chain_calls == []
+    assert sum(len(cases) for cases in fake_tester.calls) == 2
+
+def test_qa_batch_runner_failure_calls_qa_llm_once(fake_tester, qa_chain_calls, base_state):
+    fake_tester.status = 'test_fail'
+    state = dict(base_state, generated_code='def add(a, b):\n    return a - b', generated_test_cases=[ADD_CASE, dict(ADD_CASE, inputs=[1, 4])])
+    result = qa_batch_runner_node(state)
+    assert result['all_tests_passed'] is False
+    assert result['current_test_status'] == 'test_fail'
+    assert qa_chain_calls == ['qa']
+    assert 'QA analysis: The add function subtracts' in result['current_test_message']
+    assert len(result['qa_agent_messages']) == 1
+
+def test_qa_batch_runner_without_code_keeps_developer_error(fake_tester, qa_chain_calls, base_state):
+    developer_error = (ErrorKind.DEVELOPER, 'Developer agent failed to produce a parsable code block.')
+    state = dict(base_state, generated_code=None, generated_test_cases=[ADD_CASE], current_error=developer_error)
+    merge_state_update(state, qa_batch_runner_node(state))
+    assert state['current_error'] == developer_error
+    assert state['all_tests_passed'] is False
+    assert fake_tester.calls == [] and qa_chain_calls == []
@@ -1,44 +1,36 @@
-import sys
-import os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-
 import pytest
-from main_pipeline.state import GraphState
-from main_pipeline.graph import decide_after_architect, decide_after_planner, decide_after_test_case_designer
+from main_pipeline.state import ErrorKind
+from main_pipeline.graph import decide_after_architect, decide_after_planner, decide_after_test_case_designer, decide_after_qa, decide_after_post_dev, build_graph
+from langgraph.graph import END
 
-def test_decide_after_architect_success():
-    state = GraphState(
-        initial_user_request='Test', architectural_decision={'chosen_language': 'python'}, clarified_user_input=None,
-        clarification_questions_for_user=None, planner_iteration_count=0, max_planner_iterations=2,
-        llm_models_config={}, planned_task_description=None, planner_notes=None, task_description='',
-        generated_test_cases=None, current_test_case_index=0, all_tests_passed=False, generated_code=None,
-        current_test_status=None, current_test_message=None, test_results_summary=[], critique=None,
-        validation_status=None, validation_issues=None, packaged_artifacts_info=None, handoff_summary=None,
-        feedback_history=[], refinement_count=0, max_refinements=2, current_error=None, qa_agent_messages=[]
-    )
+def test_decide_after_architect_success(base_state):
+    state = dict(base_state, architectural_decision={'chosen_language': 'python'})
     assert decide_after_architect(state) == 'planner_agent_node'
 
-def test_decide_after_planner_to_test_case_designer():
-    state = GraphState(
-        initial_user_request='Test', architectural_decision={'chosen_language': 'python'}, clarified_user_input=None,
-        clarification_questions_for_user=None, planner_iteration_count=0, max_planner_iterations=2,
-        llm_models_config={}, planned_task_description='desc', planner_notes=None, task_description='desc',
-        generated_test_cases=None, current_test_case_index=0, all_tests_passed=False, generated_code=None,
-        current_test_status=None, current_test_message=None, test_results_summary=[], critique=None,
-        validation_status=None, validation_issues=None, packaged_artifacts_info=None, handoff_summary=None,
-        feedback_history=[], refinement_count=0, max_refinements=2, current_error=None, qa_agent_messages=[]
-    )
+def test_decide_after_planner_to_test_case_designer(base_state):
+    state = dict(base_state, architectural_decision={'chosen_language': 'python'}, planned_task_description='desc', task_description='desc')
     assert decide_after_planner(state) == 'test_case_designer_node'
 
-def test_decide_after_test_case_designer_success():
-    state = GraphState(
-        initial_user_request='Test', architectural_decision=None, clarified_user_input=None,
-        clarification_questions_for_user=None, planner_iteration_count=0, max_planner_iterations=2,
-        llm_models_config={}, planned_task_description=None, planner_notes=None, task_description='',
-        generated_test_cases=[{'function_name': 'foo', 'inputs': (), 'expected_output': 1, 'description': 'desc'}],
-        current_test_case_index=0, all_tests_passed=False, generated_code=None,
-        current_test_status=None, current_test_message=None, test_results_summary=[], critique=None,
-        validation_status=None, validation_issues=None, packaged_artifacts_info=None, handoff_summary=None,
-        feedback_history=[], refinement_count=0, max_refinements=2, current_error=None, qa_agent_messages=[]
-    )
-    assert decide_after_test_case_designer(state) == 'developer_agent_node'
\ No newline at end of file
+def test_decide_after_test_case_designer_success(base_state):
+    state = dict(base_state, generated_test_cases=[{'function_name': 'foo', 'inputs': (), 'expected_output': 1, 'description': 'desc'}])
+    assert decide_after_test_case_designer(state) == 'developer_agent_node'
+
+def test_decide_after_qa_retries_developer_on_developer_error(base_state):
+    state = dict(base_state, current_test_status='tool_error', refinement_count=1,
+                 current_error=(ErrorKind.DEVELOPER, 'Developer agent failed to produce a parsable code block.'))
+    assert decide_after_qa(state) == 'developer_agent_node'
+    state['refinement_count'] = 2
+    assert decide_after_qa(state) == END
+
+def test_build_graph_prunes_unreachable_branches():
+    app = build_graph(max_refinements=1, max_planner_iterations=1)
+    assert 'critique_agent_node' not in app.nodes
+    assert 'human_interaction_node' not in app.nodes
+    assert 'handoff_node' in app.nodes
+    assert 'critique_agent_node' in build_graph().nodes
+
+def test_decide_after_post_dev_packages_when_tests_and_validation_pass(base_state):
+    state = dict(base_state, current_test_status='success', all_tests_passed=True, validation_status='pass', refinement_count=1)
+    assert decide_after_post_dev(state) == 'artifact_packaging_node'
+    state['validation_status'] = 'fail'
+    assert decide_after_post_dev(state) == 'critique_agent_node'
@@ -1,39 +1,25 @@
-import sys
-import os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-
 import pytest
-from main_pipeline.state import GraphState
+from main_pipeline.state import GraphState, make_graph_state, merge_state_update
 
-def test_graph_state_fields():
-    state = GraphState(
-        initial_user_request="test",
-        architectural_decision=None,
-        clarified_user_input=None,
-        clarification_questions_for_user=None,
-        planner_iteration_count=0,
-        max_planner_iterations=2,
-        llm_models_config={},
-        planned_task_description=None,
-        planner_notes=None,
-        task_description="",
-        generated_test_cases=None,
-        current_test_case_index=0,
-        all_tests_passed=False,
-        generated_code=None,
-        current_test_status=None,
-        current_test_message=None,
-        test_results_summary=[],
-        critique=None,
-        validation_status=None,
-        validation_issues=None,
-        packaged_artifacts_info=None,
-        handoff_summary=None,
-        feedback_history=[],
-        refinement_count=0,
-        max_refinements=2,
-        current_error=None,
-        qa_agent_messages=[]
-    )
+def test_graph_state_fields(base_state):
+    state = GraphState(**dict(base_state, initial_user_request="test"))
     assert state["initial_user_request"] == "test"
-    assert state["planner_iteration_count"] == 0
\ No newline at end of file
+    assert state["planner_iteration_count"] == 0
+
+def test_make_graph_state_fills_every_field():
+    state = make_graph_state(max_refinements=5)
+    assert set(state) == set(GraphState.__annotations__)
+    assert state["max_refinements"] == 5
+    assert make_graph_state()["feedback_history"] is not state["feedback_history"]
+
+def test_merge_state_update_appends_reducer_fields(base_state):
+    state = dict(base_state, feedback_history=['first'])
+    merge_state_update(state, {'feedback_history': ['second'], 'critique': 'c'})
+    assert state['feedback_history'] == ['first', 'second']
+    assert state['critique'] == 'c'
+
+def test_merge_state_update_none_resets_reducer_fields(base_state):
+    state = dict(base_state, feedback_history=['stale'], test_results_summary=[{'status': 'success'}])
+    merge_state_update(state, {'feedback_history': None, 'test_results_summary': []})
+    assert state['feedback_history'] == []
+    assert state['test_results_summary'] == [{'status': 'success'}]
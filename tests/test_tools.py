@@ -1,16 +1,30 @@
-import sys
-import os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-
 import pytest
 from main_pipeline.tools import code_tester_tool, extract_python_code
 
-def test_code_tester_tool_success():
-    code = """def add(a, b):\n    return a + b"""
-    result = code_tester_tool(code, "add", (2, 3), 5)
+ADD_SOURCE = """def add(a, b):\n    return a + b"""
+
+@pytest.mark.parametrize("inputs, expected", [((2, 3), 5), ((0, 0), 0), ((-1, 1), 0), ((10, -4), 6)])
+def test_code_tester_tool_success(inputs, expected):
+    result = code_tester_tool(ADD_SOURCE, "add", inputs, expected)
     assert result["status"] == "success"
-    assert result["actual_output"] == 5
+    assert result["actual_output"] == expected
 
 def test_extract_python_code():
     code_block = """```python\ndef foo():\n    return 42\n```"""
-    assert extract_python_code(code_block) == "def foo():\n    return 42"
\ No newline at end of file
+    assert extract_python_code(code_block) == "def foo():\n    return 42"
+
+def test_code_tester_tool_reports_compilation_error():
+    result = code_tester_tool("def add(a, b)\n    return a + b", "add", (2, 3), 5)
+    assert result["status"] == "compilation_error"
+
+def test_code_tester_tool_removes_open_builtin():
+    # Only the bare builtin is gone; imports remain allowed, so this is not a file-access sandbox.
+    code = """def read():\n    return open('/etc/hostname').read()"""
+    result = code_tester_tool(code, "read", (), "")
+    assert result["status"] == "runtime_error"
+
+def test_code_tester_tool_tolerates_float_rounding():
+    code = """def total(values):\n    return sum(values)"""
+    result = code_tester_tool(code, "total", ([0.1, 0.2],), 0.3)
+    assert result["status"] == "success"
+    assert "math.isclose" in result["message"]
@@ -1,65 +1,154 @@
 import streamlit as st
-from main_pipeline import agents, demo, tools, prompts, state, rag, graph
+from main_pipeline.state import ErrorKind
 
 # UI display helpers (e.g., display_graph_state) will go here
 
-def display_graph_state(graph_state_dict):
-    if not graph_state_dict:
-        st.info("Pipeline has not run yet or no state to display.")
-        return
-    st.subheader("Pipeline State Overview")
-    key_fields_ordered = [
-        "initial_user_request", "current_error", "architectural_decision",
-        "clarification_questions_for_user", "clarified_user_input",
-        "planner_iteration_count", "max_planner_iterations", "planned_task_description",
-        "planner_notes", "task_description", "refinement_count", "max_refinements",
-        "generated_code", 
-        "validation_status", "validation_issues", "critique", "feedback_history",
-        "packaged_artifacts_info", "handoff_summary",
+KEY_FIELDS_ORDERED = [
+    "initial_user_request", "current_error", "architectural_decision",
+    "clarification_questions_for_user", "clarified_user_input",
+    "planner_iteration_count", "max_planner_iterations", "planned_task_description",
+    "planner_notes", "task_description", "refinement_count", "max_refinements",
+    "generated_code", 
+    "validation_status", "validation_issues", "critique", "feedback_history",
+    "packaged_artifacts_info", "handoff_summary",
+]
+FEEDBACK_TAIL_LENGTH = 20
+JSON_INLINE_LIMIT_CHARS = 8_000
+_FIELD_LABELS = tuple((key, key.replace('_', ' ').title()) for key in KEY_FIELDS_ORDERED)
+TEST_HEADER_FIELDS = (
+    "generated_test_cases", "current_test_case_index", "all_tests_passed",
+    "current_test_status", "current_test_message",
+)
+
+def _same(prev, cur):
+    # State updates replace values rather than mutating them, so containers compare by identity
+    if isinstance(prev, tuple) and isinstance(cur, tuple):
+        return len(prev) == len(cur) and all(_same(p, c) for p, c in zip(prev, cur))
+    return prev is cur or (isinstance(prev, (int, float, str)) and prev == cur)
+
+def _changed_placeholder(field_placeholders, key, fingerprint):
+    # Returns the field's placeholder when it needs a redraw, None when it is already up to date
+    slot = field_placeholders.get(key)
+    if slot is None:
+        slot = field_placeholders[key] = [st.empty(), None]
+    elif _same(slot[1], fingerprint):
+        return None
+    slot[1] = fingerprint
+    return slot[0]
+
+def _render_field(key, value):
+    if isinstance(value, (dict, list)) and key not in ["feedback_history", "validation_issues", "clarification_questions_for_user"]:
+        size = len(repr(value))
+        if size < JSON_INLINE_LIMIT_CHARS or st.session_state.get("load_large_json_fields"):
+            st.json(value, expanded=False)
+        else:
+            st.caption(f"({size} chars, hidden; enable 'Load large JSON fields' in the sidebar to view.)")
+    elif key == "generated_code": st.code(value, language="python")
+    elif key == "current_error":
+        error_kind, error_message = value
+        st.error(f"[{ErrorKind(error_kind).value}] {error_message}")
+    elif key == "feedback_history":
+        recent = value if st.session_state.get("show_full_feedback_history") else value[-FEEDBACK_TAIL_LENGTH:]
+        for i, item in enumerate(reversed(recent)): st.markdown(f"```\nF{len(value)-i}: {item}\n```")
+        if len(recent) < len(value):
+            st.caption(f"{len(value) - len(recent)} earlier entries hidden; enable 'Show full feedback history' in the sidebar.")
+    elif key == "validation_issues" or key == "clarification_questions_for_user":
+        if value:
+            for item_val in value: st.warning(f"- {item_val}")
+        else: st.caption("None")
+    else: st.markdown(f"```\n{value}\n```")
+
+def _test_result_markdown(i, result):
+    tc = result["test_case"]
+    status_icon = "✅" if result["status"] == "success" else "❌"
+    lines = [
+        f"--- \n**Test {i+1}: {status_icon} {tc.get('description', 'N/A')}**",
+        f"Function: `{tc['function_name']}`, Inputs: `{tc['inputs']}`, Expected: `{tc['expected_output']}`",
     ]
-    for key in key_fields_ordered:
-        if key in graph_state_dict and graph_state_dict[key] is not None and graph_state_dict[key] != []:
-            with st.expander(f"{key.replace('_', ' ').title()}", expanded=True):
-                value = graph_state_dict[key]
-                if isinstance(value, (dict, list)) and key not in ["feedback_history", "validation_issues", "clarification_questions_for_user"]:
-                    st.json(value)
-                elif key == "generated_code": st.code(value, language="python")
-                elif key == "feedback_history":
-                    for i, item in enumerate(reversed(value)): st.markdown(f"```\nF{len(value)-i}: {item}\n```")
-                elif key == "validation_issues" or key == "clarification_questions_for_user":
-                    if value:
-                        for item_val in value: st.warning(f"- {item_val}")
-                    else: st.caption("None")
-                else: st.markdown(f"```\n{value}\n```")
+    if result["status"] != "success":
+        lines.append(f"🔴 **Status:** {result['status']} - **Message:** {result['message']}")
+        if "actual_output" in result:
+            lines.append(f"Actual Output: `{result['actual_output']}`")
+    else:
+        lines.append(f"🟢 **Status:** {result['status']}")
+    return "\n\n".join(lines)
 
-    # Special display for Test Case information
-    if "generated_test_cases" in graph_state_dict and graph_state_dict["generated_test_cases"]:
-        with st.expander("Test Cases & Results", expanded=True):
+def _display_test_section(graph_state_dict, field_placeholders):
+    # test_results_summary only grows, so already-rendered results stay put and only new ones are appended
+    section = field_placeholders.get("_test_section")
+    if section is None:
+        section = field_placeholders["_test_section"] = {"placeholder": st.empty(), "header": None, "results": None, "header_key": None, "rendered_count": 0}
+    results = graph_state_dict.get("test_results_summary") or []
+    if not graph_state_dict.get("generated_test_cases"):
+        if section["header"] is not None:
+            section["placeholder"].empty()
+            section.update(header=None, results=None, header_key=None, rendered_count=0)
+        return
+    if section["header"] is None or len(results) < section["rendered_count"]:
+        with section["placeholder"].container():
+            with st.expander("Test Cases & Results", expanded=True):
+                section["header"] = st.empty()
+                section["results"] = st.container()
+        section.update(header_key=None, rendered_count=0)
+
+    header_key = tuple(graph_state_dict.get(field) for field in TEST_HEADER_FIELDS) + (bool(results),)
+    if not _same(section["header_key"], header_key):
+        section["header_key"] = header_key
+        with section["header"].container():
             st.markdown(f"**Total Generated Test Cases:** {len(graph_state_dict['generated_test_cases'])}")
             st.markdown(f"**Current Test Index (next to run):** {graph_state_dict.get('current_test_case_index', 0)}")
             st.markdown(f"**All Tests Passed (so far in current dev cycle):** {graph_state_dict.get('all_tests_passed', False)}")
-
-            if "test_results_summary" in graph_state_dict and graph_state_dict["test_results_summary"]:
+            if results:
                 st.markdown("**Individual Test Results:**")
-                for i, result in enumerate(graph_state_dict["test_results_summary"]):
-                    tc = result["test_case"]
-                    status_icon = "✅" if result["status"] == "success" else "❌"
-                    with st.container():
-                        st.markdown(f"--- \n**Test {i+1}: {status_icon} {tc.get('description', 'N/A')}**")
-                        st.caption(f"Function: `{tc['function_name']}`, Inputs: `{tc['inputs']}`, Expected: `{tc['expected_output']}`")
-                        if result["status"] != "success":
-                            st.error(f"Status: {result['status']} - Message: {result['message']}")
-                            if "actual_output" in result:
-                                st.caption(f"Actual Output: `{result['actual_output']}`")
-                        else:
-                             st.success(f"Status: {result['status']}")
             elif graph_state_dict.get("current_test_status"):
                  st.markdown(f"**Last Run Test Status:** {graph_state_dict['current_test_status']}")
                  st.markdown(f"**Message:** {graph_state_dict['current_test_message']}")
 
+    rendered_count = section["rendered_count"]
+    if len(results) > rendered_count:
+        # One markdown element per batch of new results instead of several widgets per result
+        section["results"].markdown("\n\n".join(_test_result_markdown(i, results[i]) for i in range(rendered_count, len(results))))
+        section["rendered_count"] = len(results)
+
+def display_graph_state(graph_state_dict, field_placeholders=None):
+    # Pass the same field_placeholders dict on repeated calls within a script run to redraw only changed fields
+    if not graph_state_dict:
+        st.info("Pipeline has not run yet or no state to display.")
+        return
+    if field_placeholders is None:
+        field_placeholders = {}
+    if not field_placeholders:
+        st.subheader("Pipeline State Overview")
+    for key, label in _FIELD_LABELS:
+        value = graph_state_dict.get(key)
+        # str caches its hash, so a regenerated but identical code block is skipped without a full compare
+        fingerprint = hash(value) if key == "generated_code" and value else value
+        placeholder = _changed_placeholder(field_placeholders, key, fingerprint)
+        if placeholder is None:
+            continue
+        if value is None or value == []:
+            placeholder.empty()
+            continue
+        with placeholder.container():
+            with st.expander(label, expanded=True):
+                _render_field(key, value)
+
+    # Special display for Test Case information
+    _display_test_section(graph_state_dict, field_placeholders)
+
     # Display the pipeline steps as a multi-line list
-    if "run_events_log" in st.session_state and st.session_state["run_events_log"]:
-        steps = [f"{event.get('timestamp','')} - {event.get('node','') or ''}" for event in st.session_state["run_events_log"] if event.get('node')]
-        if steps:
-            st.markdown("**Pipeline Steps (in order):**")
-            st.text("\n".join(steps))
\ No newline at end of file
+    run_events_log = st.session_state.get("run_events_log") or ()
+    # The log is a bounded deque, so its length stops changing once full; the newest event marks new entries
+    log_key = (len(run_events_log), run_events_log[-1] if run_events_log else None)
+    placeholder = _changed_placeholder(field_placeholders, "_steps", log_key)
+    if placeholder is not None:
+        steps_text, cached_key = st.session_state.get("_steps_cache", ("", None))
+        if not _same(cached_key, log_key):
+            steps_text = "\n".join(f"#{event['seq']} +{event['ts_ns'] / 1e9:.3f}s - {event['node']}" for event in run_events_log if event.get('node'))
+            st.session_state._steps_cache = (steps_text, log_key)
+        if steps_text:
+            with placeholder.container():
+                st.markdown("**Pipeline Steps (in order):**")
+                st.text(steps_text)
+        else:
+            placeholder.empty()
@@ -1,35 +1,135 @@
+import asyncio
+import itertools
+import queue
+import threading
+import time
 import streamlit as st
 from ui.display import display_graph_state
+from main_pipeline.state import merge_state_update
 import main_pipeline
 
+STREAM_DONE = "__stream_done__"
+POLL_INTERVAL_SECONDS = 0.5
+
+@st.cache_resource
+def get_compiled_app(max_refinements, max_planner_iterations):
+    # Streamlit reruns this script on every interaction; compile the graph once per set of limits.
+    return main_pipeline.build_graph(max_refinements=max_refinements, max_planner_iterations=max_planner_iterations)
+
+async def _pump(app, state, stream_mode, events, stop_event):
+    try:
+        # astream can't abort an in-flight node, so a stop takes effect at the next node boundary
+        async for event_chunk in app.astream(state, {"recursion_limit": 250}, stream_mode=stream_mode):
+            if stop_event.is_set():
+                break
+            events.put(event_chunk)
+    except Exception as e:
+        events.put(e)
+    finally:
+        events.put(STREAM_DONE)
+
+def _start_stream_thread(app, state, stream_mode):
+    # Run the graph on its own event loop so LLM calls never block the Streamlit script thread
+    events = queue.Queue()
+    stop_event = threading.Event()
+    thread = threading.Thread(target=lambda: asyncio.run(_pump(app, dict(state), stream_mode, events, stop_event)), daemon=True)
+    thread.start()
+    st.session_state.stream_thread = thread
+    st.session_state.stream_events = events
+    st.session_state.stream_stop_event = stop_event
+    st.session_state.stream_failure = None
+    st.session_state.event_seq = itertools.count()
+    st.session_state.run_started_ns = time.monotonic_ns()
+
+def stop_stream_thread():
+    stop_event = st.session_state.get("stream_stop_event")
+    if stop_event is not None:
+        stop_event.set()
+    st.session_state.stream_thread = None
+
+def _apply_event(current_graph_state, event_chunk, stream_mode):
+    if stream_mode == "values":
+        current_graph_state.update(event_chunk)
+        return "state snapshot"
+    node_name, node_output = next(iter(event_chunk.items()))
+    if isinstance(node_output, dict):
+        merge_state_update(current_graph_state, node_output)
+    return node_name
+
+def _state_changed(previous_values, current_values):
+    # State values are replaced, never mutated in place; holding the old tuple keeps ids from being reused
+    return previous_values is None or len(previous_values) != len(current_values) or any(
+        prev is not cur for prev, cur in zip(previous_values, current_values))
+
 def run_pipeline():
-    # Incremental pipeline execution logic (port of original event loop)
+    # Consume the background stream within a single script run; a widget interaction interrupts this
+    # run, and the rerun picks the still-running thread and its queue back up from session_state.
     if 'pipeline_active' not in st.session_state:
         st.session_state.pipeline_active = False
     if 'current_graph_state' not in st.session_state:
         st.session_state.current_graph_state = None
     if st.session_state.pipeline_active:
-        app = main_pipeline.build_graph()
-        if st.session_state.stream_iterator is None:
-            current_input_state_for_stream = st.session_state.current_graph_state
-            st.session_state.stream_iterator = app.stream(current_input_state_for_stream, {"recursion_limit": 250})
-        if st.session_state.stream_iterator:
-            event_chunk = next(st.session_state.stream_iterator, "STREAM_ENDED_SENTINEL")
-            if event_chunk and event_chunk != "STREAM_ENDED_SENTINEL":
-                node_name = list(event_chunk.keys())[0]
-                node_output = event_chunk[node_name]
-                if isinstance(node_output, dict):
-                    st.session_state.current_graph_state.update(node_output)
-                st.session_state.run_events_log.append({
-                    "timestamp": "now",  # Replace with real timestamp if needed
-                    "node": node_name,
-                    "message": f"Output from {node_name} received."
-                })
-                display_graph_state(st.session_state.current_graph_state)
-                st.rerun()
-            else:
+        status_placeholder = st.empty()
+        state_container = st.container()
+        field_placeholders = {}
+        current_graph_state = st.session_state.current_graph_state
+        if st.session_state.get("stream_thread") is None:
+            app = get_compiled_app(current_graph_state["max_refinements"], current_graph_state["max_planner_iterations"])
+            st.session_state.stop_requested = False
+            # "updates" yields only each node's delta; "values" yields full snapshots for debugging.
+            st.session_state.stream_mode = "values" if st.session_state.get("show_full_state_snapshots") else "updates"
+            _start_stream_thread(app, current_graph_state, st.session_state.stream_mode)
+        stream_mode = st.session_state.stream_mode
+        events = st.session_state.stream_events
+        status_placeholder.info(st.session_state.current_step_message or "Pipeline running...")
+        with state_container:
+            display_graph_state(current_graph_state, field_placeholders)
+        rendered_values = tuple(current_graph_state.values())
+        while True:
+            if st.session_state.get("stop_requested"):
+                stop_stream_thread()
+                status_placeholder.warning("Pipeline stopped by user.")
                 st.session_state.pipeline_active = False
-                st.session_state.stream_iterator = None
-                display_graph_state(st.session_state.current_graph_state)
+                return
+            try:
+                event_chunk = events.get(timeout=POLL_INTERVAL_SECONDS)
+            except queue.Empty:
+                # Touching an element each poll lets Streamlit interrupt this run for a pending widget rerun
+                elapsed_seconds = (time.monotonic_ns() - st.session_state.run_started_ns) / 1e9
+                status_placeholder.info(f"{st.session_state.current_step_message or 'Pipeline running...'} ({elapsed_seconds:.0f}s elapsed)")
+                continue
+            if event_chunk == STREAM_DONE:
+                break
+            if isinstance(event_chunk, Exception):
+                # Kept in session_state so it survives an interaction rerun before STREAM_DONE arrives
+                st.session_state.stream_failure = event_chunk
+                continue
+            node_name = _apply_event(current_graph_state, event_chunk, stream_mode)
+            st.session_state.run_events_log.append({
+                # Monotonic ordering plus nanoseconds since the run started; formatted only for display
+                "seq": next(st.session_state.event_seq),
+                "ts_ns": time.monotonic_ns() - st.session_state.run_started_ns,
+                "node": node_name,
+                "message": f"Output from {node_name} received."
+            })
+            st.session_state.current_step_message = f"Completed step: {node_name}"
+            status_placeholder.info(st.session_state.current_step_message)
+            current_values = tuple(current_graph_state.values())
+            if _state_changed(rendered_values, current_values):
+                rendered_values = current_values
+                with state_container:
+                    display_graph_state(current_graph_state, field_placeholders)
+        # The step list is keyed on the events log, which may have grown without a state change
+        with state_container:
+            display_graph_state(current_graph_state, field_placeholders)
+        st.session_state.stream_thread = None
+        st.session_state.pipeline_active = False
+        failure = st.session_state.get("stream_failure")
+        if failure is not None:
+            status_placeholder.error(f"Pipeline failed: {failure}")
+        else:
+            status_placeholder.success("Pipeline finished.")
+    elif st.session_state.get("stop_requested"):
+        st.warning("Pipeline stopped by user. Click start to run it again.")
     else:
-        st.info('Pipeline is not active. Click start to begin.')
\ No newline at end of file
+        st.info('Pipeline is not active. Click start to begin.')
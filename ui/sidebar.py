@@ -1,16 +1,33 @@
 import streamlit as st
+from main_pipeline.rag import cached_rag_query
+from ui.pipeline_runner import get_compiled_app, stop_stream_thread
 
 def render_sidebar():
     st.sidebar.title("Autonomous Software Factory")
-    if 'initial_user_request' not in st.session_state:
-        st.session_state.initial_user_request = "Can you make a python function? It should be for greeting people. Needs good docs."
-
     st.sidebar.text_area("Initial User Request", key="initial_user_request")
+    st.sidebar.checkbox("Show full state snapshots", key="show_full_state_snapshots")
+    st.sidebar.checkbox("Show full feedback history", key="show_full_feedback_history")
+    st.sidebar.checkbox("Load large JSON fields", key="load_large_json_fields")
 
     if st.sidebar.button("Start Pipeline"):
         st.session_state.pipeline_active = True
+        st.session_state.stop_requested = False
         st.rerun()
+    if st.sidebar.button("Stop Pipeline"):
+        st.session_state.stop_requested = True
+        st.session_state.pipeline_active = False
+        stop_stream_thread()
     if st.sidebar.button("Reset State"):
         st.session_state.pipeline_active = False
+        st.session_state.stop_requested = False
+        stop_stream_thread()
         st.session_state.current_graph_state = None
-        st.rerun()
\ No newline at end of file
+        cached_rag_query.cache_clear()
+        get_compiled_app.clear()
+        # Imported here so rendering the sidebar doesn't load the agents' LLM stack
+        from main_pipeline.agents import clear_chain_cache
+        clear_chain_cache()
+        st.rerun()
+    if st.sidebar.button("Rebuild Graph"):
+        # Drop the cached compiled app so edits to nodes/edges take effect without restarting Streamlit.
+        get_compiled_app.clear()
\ No newline at end of file
@@ -1,21 +1,33 @@
 # UI session state helpers and initialization will go here
+import collections
+import copy
 import streamlit as st
-from main_pipeline.demo import initial_state
+from main_pipeline.demo import initial_state, initial_user_req
+
+RUN_EVENTS_LOG_MAXLEN = 500
+
+# Session defaults; callables are factories so each session gets fresh mutable objects
+_DEFAULTS = {
+    "pipeline_active": False,
+    # Each session mutates its own copy; the module-level demo state stays pristine
+    "current_graph_state": lambda: copy.deepcopy(initial_state),
+    "initial_user_request": initial_user_req,
+    "run_events_log": lambda: collections.deque(maxlen=RUN_EVENTS_LOG_MAXLEN),
+    "_steps_cache": ("", None),
+    "stop_requested": False,
+    "stream_thread": None,
+    "current_step_message": '',
+    "human_input_required_planner": False,
+    "clarification_questions_cache": None,
+    "run_pipeline_clicked": False,
+}
 
 def initialize_ui_state():
-    if 'pipeline_active' not in st.session_state:
-        st.session_state.pipeline_active = False
-    if 'current_graph_state' not in st.session_state or st.session_state.current_graph_state is None:
-        st.session_state.current_graph_state = initial_state
-    if 'run_events_log' not in st.session_state:
-        st.session_state.run_events_log = []
-    if 'stream_iterator' not in st.session_state:
-        st.session_state.stream_iterator = None
-    if 'current_step_message' not in st.session_state:
-        st.session_state.current_step_message = ''
-    if 'human_input_required_planner' not in st.session_state:
-        st.session_state.human_input_required_planner = False
-    if 'clarification_questions_cache' not in st.session_state:
-        st.session_state.clarification_questions_cache = None
-    if 'run_pipeline_clicked' not in st.session_state:
-        st.session_state.run_pipeline_clicked = False
\ No newline at end of file
+    session_state = st.session_state
+    if session_state.get("current_graph_state") is None:
+        # Reset State sets this to None, so it is reseeded even though the key exists
+        session_state.pop("current_graph_state", None)
+    for key, default in _DEFAULTS.items():
+        # A membership test rather than setdefault, so factories run only for missing keys
+        if key not in session_state:
+            session_state[key] = default() if callable(default) else default